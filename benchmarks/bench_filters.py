@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Benchmark the issue filters of GitHubRepo."""
+
+from __future__ import print_function
+
+# Standard library imports
+import sys
+import time
+
+# Local imports
+from loghub.core.models import IssueProjector
+from loghub.core.repo import GitHubRepo
+
+SINCE = '2015-01-01T00:00:00Z'
+UNTIL = '2019-12-31T00:00:00Z'
+MILESTONE = 'v1'
+
+
+def make_issues(number):
+    """Return `number` issue records spread over several years."""
+    project = IssueProjector()
+    return [project({
+        'number': n,
+        'labels': [],
+        'closed_at': '{0}-06-01T00:00:00Z'.format(2010 + n % 15),
+        'milestone': {'number': n % 3, 'title': 'v{0}'.format(n % 3)},
+    }) for n in range(number)]
+
+
+def filter_list_remove(gh, issues):
+    """Previous filters, copying the list and removing items in place."""
+    since_date = gh.str_to_date(SINCE)
+    until_date = gh.str_to_date(UNTIL)
+    for issue in issues[:]:
+        if gh.str_to_date(issue['closed_at']) < since_date \
+                and issue in issues:
+            issues.remove(issue)
+    for issue in issues[:]:
+        if gh.str_to_date(issue['closed_at']) > until_date \
+                and issue in issues:
+            issues.remove(issue)
+    for issue in issues[:]:
+        if issue['milestone']['title'] != MILESTONE:
+            issues.remove(issue)
+    return issues
+
+
+def filter_pipeline(gh, issues):
+    """Current single pass generator pipeline."""
+    issues = gh._filter_since(issues, SINCE)
+    issues = gh._filter_until(issues, UNTIL)
+    return list(gh._filter_milestone(issues, MILESTONE))
+
+
+def timed(func, *args):
+    """Return the seconds taken by `func`."""
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main(max_remove=20000):
+    """Run the benchmark."""
+    gh = GitHubRepo.__new__(GitHubRepo)
+    print('{0:>8} {1:>14} {2:>14}'.format('issues', 'list.remove', 'pipeline'))
+    for number in (1000, 5000, 10000, 20000, 50000, 100000):
+        issues = make_issues(number)
+        pipeline = timed(filter_pipeline, gh, issues)
+        if number <= max_remove:
+            remove = '{0:.3f} s'.format(
+                timed(filter_list_remove, gh, issues[:]))
+        else:
+            remove = '-'
+        print('{0:>8} {1:>14} {2:>12.3f} s'.format(number, remove, pipeline))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
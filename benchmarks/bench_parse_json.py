@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Benchmark json decoding of Github issue pages."""
+
+from __future__ import print_function
+
+# Standard library imports
+import json
+import sys
+import timeit
+
+# Local imports
+from loghub.external.github import JsonObject, _json_loads, _parse_json
+
+
+def issue_payload(number):
+    """Return an issue payload shaped like the Github REST api ones."""
+    url = 'https://api.github.com/repos/spyder-ide/spyder/issues/{0}'
+    user = {
+        'login': 'user-{0}'.format(number % 50),
+        'id': number,
+        'avatar_url': 'https://avatars.githubusercontent.com/u/1?v=4',
+        'url': 'https://api.github.com/users/user',
+        'html_url': 'https://github.com/user',
+        'type': 'User',
+        'site_admin': False,
+    }
+    return {
+        'url': url.format(number),
+        'repository_url': 'https://api.github.com/repos/spyder-ide/spyder',
+        'labels_url': url.format(number) + '/labels{/name}',
+        'comments_url': url.format(number) + '/comments',
+        'events_url': url.format(number) + '/events',
+        'html_url': 'https://github.com/spyder-ide/spyder/issues/{0}'.format(
+            number),
+        'id': 1000000 + number,
+        'node_id': 'MDU6SXNzdWUx',
+        'number': number,
+        'title': 'Issue title number {0}'.format(number),
+        'user': user,
+        'labels': [{
+            'id': i,
+            'node_id': 'MDU6TGFiZWwx',
+            'url': 'https://api.github.com/repos/spyder-ide/spyder/labels/x',
+            'name': 'type:bug-{0}'.format(i),
+            'color': 'fc2929',
+            'default': False,
+            'description': 'Something is not working',
+        } for i in range(3)],
+        'state': 'closed',
+        'locked': False,
+        'assignee': user,
+        'assignees': [user],
+        'milestone': {
+            'number': 1,
+            'title': 'v4.0',
+            'creator': user,
+            'open_issues': 0,
+            'closed_issues': 100,
+            'closed_at': '2020-01-01T00:00:00Z',
+        },
+        'comments': 3,
+        'created_at': '2019-01-01T00:00:00Z',
+        'updated_at': '2020-01-02T00:00:00Z',
+        'closed_at': '2020-01-01T00:00:00Z',
+        'author_association': 'MEMBER',
+        'body': 'Description of the problem\n' * 20,
+        'reactions': dict(('reaction_{0}'.format(i), 0) for i in range(10)),
+        'performed_via_github_app': None,
+    }
+
+
+def parse_json_hook(jsonstr):
+    """Previous decoding, copying every object through a Python hook."""
+    def _obj_hook(pairs):
+        o = JsonObject()
+        for k, v in pairs.items():
+            o[str(k)] = v
+        return o
+
+    return json.loads(jsonstr, object_hook=_obj_hook)
+
+
+def main(number=200):
+    """Run the benchmark."""
+    page = json.dumps([issue_payload(n) for n in range(100)])
+    print('Decoder: {0}.{1}'.format(_json_loads.__module__,
+                                   _json_loads.__name__))
+    print('Page of 100 issues, {0} KB'.format(len(page) // 1024))
+
+    results = []
+    for name, func in [('object_hook', parse_json_hook),
+                       ('_parse_json', _parse_json)]:
+        seconds = min(timeit.repeat(
+            lambda: func(page), number=number, repeat=3)) / number
+        results.append(seconds)
+        print('{0:>12}: {1:.3f} ms per page'.format(name, seconds * 1000))
+
+    print('Speedup: {0:.1f}x'.format(results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Benchmark the memory kept per issue with and without projection."""
+
+from __future__ import print_function
+
+# Standard library imports
+import json
+import sys
+import tracemalloc
+
+# Local imports
+from loghub.core.models import IssueProjector
+from loghub.external.github import _parse_json
+
+USER = {
+    'login': 'user',
+    'id': 1,
+    'avatar_url': 'https://avatars.githubusercontent.com/u/1?v=4',
+    'html_url': 'https://github.com/user',
+    'url': 'https://api.github.com/users/user',
+    'type': 'User',
+    'site_admin': False,
+}
+
+
+def make_page(start, number=100):
+    """Return a json page of issue payloads shaped like the Github ones."""
+    base = 'https://api.github.com/repos/foo/bar/issues/'
+    return json.dumps([{
+        'number': n,
+        'title': 'Issue title {0}'.format(n),
+        'url': base + str(n),
+        'html_url': 'https://github.com/foo/bar/issues/{0}'.format(n),
+        'comments_url': base + '{0}/comments'.format(n),
+        'events_url': base + '{0}/events'.format(n),
+        'labels_url': base + '{0}/labels{{/name}}'.format(n),
+        'state': 'closed',
+        'body': 'Some description of the problem. ' * 30,
+        'user': dict(USER, login='user{0}'.format(n % 50)),
+        'assignee': USER,
+        'assignees': [USER],
+        'labels': [{'name': 'bug', 'color': 'fc2929', 'default': True}],
+        'reactions': {'total_count': 0, '+1': 0, '-1': 0, 'laugh': 0},
+        'created_at': '2020-01-01T00:00:00Z',
+        'updated_at': '2020-01-02T00:00:00Z',
+        'closed_at': '2020-01-02T00:00:00Z',
+    } for n in range(start, start + number)])
+
+
+def measure(pages, transform):
+    """Return the bytes kept after parsing and transforming all `pages`."""
+    tracemalloc.start()
+    kept = [transform(_parse_json(page)) for page in pages]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main(number=10000):
+    """Run the benchmark."""
+    pages = [make_page(start) for start in range(0, number, 100)]
+    raw = measure(pages, lambda issues: [dict(i) for i in issues])
+    projected = measure(pages, IssueProjector().project)
+    print('{0} issues'.format(number))
+    print('raw payloads: {0:>8.1f} KiB per 100 issues'.format(
+        raw / 1024.0 / len(pages)))
+    print('projected:    {0:>8.1f} KiB per 100 issues'.format(
+        projected / 1024.0 / len(pages)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Benchmark the extraction of fixed issue references on long PR bodies."""
+
+from __future__ import print_function
+
+# Standard library imports
+import re
+import sys
+import time
+
+# Local imports
+from loghub.core.references import KEYWORDS, find_references
+
+# Previous pattern, compiled on each call of filter_issues_fixed_by_prs
+PATTERN = re.compile(
+    r'(?P<word>' + r'|'.join(KEYWORDS) + r') '
+    r'((?P<repo>.*?)#(?P<number>\d*)|(?P<full_repo>.*)/(?P<number_2>\d*))',
+    re.IGNORECASE, )
+
+BODIES = {
+    # Traceback like lines mentioning fixes, with no references
+    'keywords': 'fix the error in module ',
+    # A single huge line ending with a path, like a minified log
+    'paths': 'fixed in a/b/c ',
+    # Regular references
+    'references': 'Fixes #123, closes spyder-ide/loghub#45\n',
+}
+
+
+def regex_references(body):
+    """Previous regex based extraction."""
+    return [match.groups() for match in PATTERN.finditer(body)]
+
+
+def timed(func, *args):
+    """Return the seconds taken by `func`."""
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main(max_regex_size=64 * 1024):
+    """Run the benchmark."""
+    print('{0:>10} {1:>10} {2:>12} {3:>12}'.format('body', 'size', 'regex',
+                                                   'tokenizer'))
+    for name, chunk in BODIES.items():
+        for size in (16 * 1024, 64 * 1024, 1024 * 1024):
+            body = chunk * (size // len(chunk))
+            tokenizer = timed(find_references, body)
+            if size <= max_regex_size:
+                regex = '{0:.3f} s'.format(timed(regex_references, body))
+            else:
+                regex = '-'
+            print('{0:>10} {1:>9}K {2:>12} {3:>10.3f} s'.format(
+                name, size // 1024, regex, tokenizer))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
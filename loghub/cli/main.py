@@ -19,7 +19,9 @@ import textwrap
 # Local imports
 from loghub.cli.common import add_common_parser_args, parse_password_check_repo
 from loghub.core.config import load_config
-from loghub.core.formatter import create_changelog
+from loghub.core.formatter import DEFAULT_OUTPUT_FILE, create_changelog
+from loghub.core.repo import API_REST, APIS
+from loghub.external.github import DEFAULT_POOL_SIZE, DEFAULT_RETRIES, TIMEOUT
 
 # yapf: enable
 
@@ -204,6 +206,92 @@ def parse_arguments(skip=False):
         dest="show_related_issues",
         default=True,
         help="Do not display related issues on prs")
+    parser.add_argument(
+        '--pool-size',
+        action="store",
+        dest="pool_size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help="Number of keep-alive connections to reuse for Github API "
+        "requests. Default is {0}".format(DEFAULT_POOL_SIZE))
+    parser.add_argument(
+        '--no-cache',
+        action="store_false",
+        dest="use_cache",
+        default=True,
+        help="Do not use the on disk cache of Github API responses")
+    parser.add_argument(
+        '--refresh',
+        action="store_true",
+        dest="refresh_cache",
+        default=False,
+        help="Ignore cached Github API responses and fetch them again")
+    parser.add_argument(
+        '--api',
+        action="store",
+        dest="api",
+        default=API_REST,
+        choices=APIS,
+        help="Github API used to retrieve issues and pull requests. The "
+        "'graphql' option needs a token. The 'search' option only fetches "
+        "the items closed between tags. Default is '{0}'".format(API_REST))
+    parser.add_argument(
+        '--wait-rate-limit',
+        action="store_true",
+        dest="wait_rate_limit",
+        default=False,
+        help="Throttle requests when the Github API rate limit is close to "
+        "be exceeded and wait for it to reset instead of exiting")
+    parser.add_argument(
+        '--timeout',
+        action="store",
+        dest="timeout",
+        type=float,
+        default=TIMEOUT,
+        help="Timeout in seconds for each Github API request. "
+        "Default is {0}".format(TIMEOUT))
+    parser.add_argument(
+        '--retries',
+        action="store",
+        dest="retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Number of retries for Github API requests failing with "
+        "transient errors. Default is {0}".format(DEFAULT_RETRIES))
+    parser.add_argument(
+        '--store',
+        action="store_true",
+        dest="use_store",
+        default=False,
+        help="Keep issues, pull requests, milestones and tags in a local "
+        "store and only fetch the ones updated since the last run")
+    parser.add_argument(
+        '--store-path',
+        action="store",
+        dest="store_path",
+        default=None,
+        help="Path of the local store file, implies --store. Default is "
+        "a file in the Loghub cache directory")
+    parser.add_argument(
+        '--offline',
+        action="store_true",
+        dest="offline",
+        default=False,
+        help="Build the changelog only from the data in the local store, "
+        "without any Github API request")
+    parser.add_argument(
+        '--output-file',
+        action="store",
+        dest="output_file",
+        default=DEFAULT_OUTPUT_FILE,
+        help="Path of the file the changelog is written to. Default is "
+        "'{0}'".format(DEFAULT_OUTPUT_FILE))
+    parser.add_argument(
+        '--quiet',
+        action="store_false",
+        dest="echo",
+        default=True,
+        help="Do not print the changelog, only write it to the output file")
 
     options = parser.parse_args()
 
@@ -297,6 +385,20 @@ def parse_arguments(skip=False):
             show_prs=options.show_prs,
             show_related_prs=options.show_related_prs,
             show_related_issues=options.show_related_issues,
+            pool_size=options.pool_size,
+            use_cache=options.use_cache,
+            refresh_cache=options.refresh_cache,
+            api=options.api,
+            wait_rate_limit=options.wait_rate_limit,
+            timeout=options.timeout,
+            retries=options.retries,
+            use_store=options.use_store or bool(options.store_path),
+            store_path=options.store_path,
+            offline=options.offline,
+            output_file=options.output_file,
+            echo=options.echo,
+            # The changelog is only needed in the output file
+            keep_text=False,
         )
 
     return options
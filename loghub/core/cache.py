@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Persistent HTTP response cache for conditional Github API requests."""
+
+# Standard library imports
+from collections import OrderedDict
+import codecs
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Constants
+DEFAULT_CACHE_SIZE = 100 * 1024 * 1024
+
+
+def user_cache_path():
+    """Return the path of the Loghub cache directory."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'loghub')
+
+
+def replace_file(src, dst):
+    """Atomically move `src` to `dst`, overwriting it if it exists."""
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+class ResponseCache(object):
+    """
+    On disk cache of Github API responses.
+
+    Entries store the response body together with its `ETag` and
+    `Last-Modified` headers, so requests can be sent as conditional requests
+    and answered with a `304 Not Modified`, which does not count against the
+    API rate limit. The total size is capped and the least recently used
+    entries are evicted first.
+    """
+
+    def __init__(self, path=None, max_size=DEFAULT_CACHE_SIZE, refresh=False):
+        """On disk cache of Github API responses."""
+        self._path = os.path.join(path or user_cache_path(), 'http')
+        self._max_size = max_size
+        self._refresh = refresh
+        self._lock = threading.Lock()
+        self._index = None
+        self._size = 0
+
+    # --- Helpers
+    @staticmethod
+    def key(url, scope=None):
+        """Return the cache key for a given `url` and auth `scope`."""
+        data = '{0} {1}'.format(scope or '', url).encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
+
+    def _entry_path(self, key):
+        """Return the path of the file storing the entry for `key`."""
+        return os.path.join(self._path, key + '.json')
+
+    def _load_index(self):
+        """Build the LRU index of stored entries, oldest first."""
+        if self._index is not None:
+            return
+
+        entries = []
+        if os.path.isdir(self._path):
+            for name in os.listdir(self._path):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self._path, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+
+        self._index = OrderedDict()
+        self._size = 0
+        for _mtime, key, size in sorted(entries):
+            self._index[key] = size
+            self._size += size
+
+    def _evict(self):
+        """Remove least recently used entries until under the size cap."""
+        while self._size > self._max_size and self._index:
+            key, size = self._index.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+
+    # --- API
+    def get(self, url, scope=None):
+        """Return the cached entry for `url` or None if not available."""
+        if self._refresh:
+            return None
+
+        key = self.key(url, scope)
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return None
+
+            path = self._entry_path(key)
+            try:
+                with codecs.open(path, 'r', 'utf-8') as f:
+                    entry = json.load(f)
+                os.utime(path, None)
+            except (IOError, OSError, ValueError):
+                self._size -= self._index.pop(key)
+                return None
+
+            # Mark as most recently used
+            self._index[key] = self._index.pop(key)
+
+        return entry
+
+    def set(self,
+            url,
+            content,
+            etag=None,
+            last_modified=None,
+            link=None,
+            scope=None):
+        """Store the response `content` for `url`."""
+        if not etag and not last_modified:
+            return
+
+        key = self.key(url, scope)
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'link': link,
+            'content': content,
+        }
+        data = json.dumps(entry).encode('utf-8')
+        with self._lock:
+            self._load_index()
+            if not os.path.isdir(self._path):
+                os.makedirs(self._path)
+
+            fd, temp_path = tempfile.mkstemp(dir=self._path, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            replace_file(temp_path, self._entry_path(key))
+
+            self._size -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def clear(self):
+        """Remove all the cached entries."""
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                try:
+                    os.remove(self._entry_path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._size = 0
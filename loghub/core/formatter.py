@@ -10,18 +10,27 @@
 # yapf: disable
 
 # Standard library imports
+from bisect import bisect_left
 from collections import OrderedDict
 import codecs
+import io
+import os
 import re
 import sys
 import time
 
 # Third party imports
-from jinja2 import Template
+from jinja2 import (BaseLoader, Environment, FileSystemBytecodeCache,
+                    TemplateNotFound)
 
 # Local imports
-from loghub.core.repo import GitHubRepo
+from loghub.core.cache import ResponseCache, replace_file, user_cache_path
+from loghub.core.models import closed_date, parse_date
+from loghub.core.references import ReferenceIndex, pr_references
+from loghub.core.repo import API_REST, GitHubRepo
+from loghub.core.store import IssueStore
 from loghub.core.zenhub import ZenHub
+from loghub.external.github import DEFAULT_POOL_SIZE, DEFAULT_RETRIES, TIMEOUT
 from loghub.templates import (CHANGELOG_GROUPS_TEMPLATE_PATH,
                               CHANGELOG_ISSUE_GROUPS_TEMPLATE_PATH,
                               CHANGELOG_PR_GROUPS_TEMPLATE_PATH,
@@ -33,21 +42,96 @@ from loghub.templates import (CHANGELOG_GROUPS_TEMPLATE_PATH,
 
 # yapf: enable
 
+# Shared template environment, created on first use
+_ENVIRONMENT = None
 
-def filter_issues_fixed_by_prs(issues, prs, show_related_prs, show_related_issues):
+# Default output file and size of the buffer used to write it
+DEFAULT_OUTPUT_FILE = 'CHANGELOG.temp'
+WRITE_BUFFER_SIZE = 64 * 1024
+
+# Attribute and item lookups in templates, like `i.body` or `i['body']`
+TEMPLATE_FIELD_PATTERN = re.compile(
+    r'''\.(\w+)|\[\s*['"](\w+)['"]\s*\]''')
+
+
+class TemplatePathLoader(BaseLoader):
+    """Load templates by file path, reloading them when modified."""
+
+    def get_source(self, environment, template):
+        """Return the source, path and up to date check of `template`."""
+        try:
+            mtime = os.path.getmtime(template)
+            with codecs.open(template, 'r', 'utf-8') as f:
+                source = f.read()
+        except (IOError, OSError):
+            raise TemplateNotFound(template)
+
+        def uptodate():
+            try:
+                return os.path.getmtime(template) == mtime
+            except OSError:
+                return False
+
+        return source, template, uptodate
+
+
+def _template_bytecode_cache():
+    """
+    Return the bytecode cache of templates in the Loghub cache directory, or
+    None if the directory can not be created or written.
+    """
+    path = os.path.join(user_cache_path(), 'templates')
+    try:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+    except OSError:
+        return None
+
+    if not os.access(path, os.W_OK | os.X_OK):
+        return None
+    return FileSystemBytecodeCache(path)
+
+
+def template_environment():
+    """
+    Return the template environment shared by all renders.
+
+    Compiled templates are kept in memory for the run, and their bytecode
+    in the Loghub cache directory (under `XDG_CACHE_HOME` if set) for later
+    runs, when it can be written. Bundled templates are only compiled when
+    first used.
+    """
+    global _ENVIRONMENT
+    if _ENVIRONMENT is None:
+        _ENVIRONMENT = Environment(
+            loader=TemplatePathLoader(),
+            bytecode_cache=_template_bytecode_cache())
+    return _ENVIRONMENT
+
+
+def template_fields(template_file):
+    """
+    Return the names of all the fields a template may look up.
+
+    The result is a superset of the issue fields the template needs, used to
+    keep only those from the issue payloads.
+    """
+    with open(template_file) as f:
+        data = f.read()
+
+    return set(attr or item
+               for attr, item in TEMPLATE_FIELD_PATTERN.findall(data))
+
+
+def filter_issues_fixed_by_prs(issues, prs, show_related_prs,
+                               show_related_issues, reference_index=None):
     """
     Find related issues to prs and prs to issues that are fixed.
 
-    This adds extra information to the issues and prs listings.
+    This adds extra information to the issues and prs listings. If given,
+    `reference_index` provides the issues fixed by each PR without scanning
+    the bodies of PRs already seen.
     """
-    words = [
-        'close', 'closes', 'fix', 'fixes', 'fixed', 'resolve', 'resolves',
-        'resolved'
-    ]
-    pattern = re.compile(
-        r'(?P<word>' + r'|'.join(words) + r') '
-        r'((?P<repo>.*?)#(?P<number>\d*)|(?P<full_repo>.*)/(?P<number_2>\d*))',
-        re.IGNORECASE, )
     issue_pr_map = {}
     pr_issue_map = {}
     for pr in prs:
@@ -56,49 +140,20 @@ def filter_issues_fixed_by_prs(issues, prs, show_related_prs, show_related_issue
             pr_url = pr.html_url
             pr_number = pr.number
             user = pr.user
-            repo_url = pr_url.split('/pull/')[0] + '/issues/'
             pr_issue_map[pr_url] = []
-            body = pr.body or ''
-
-            # Remove blanks and markdown comments
-            if body:
-                lines = body.splitlines()
-                no_comments = [l for l in lines
-                               if (l and not l.startswith("<!---"))]
-                body = '\n'.join(no_comments)
-
-            for matches in pattern.finditer(body):
-                dic = matches.groupdict()
-                issue_number = dic['number'] or dic['number_2'] or ''
-                repo = dic['full_repo'] or dic['repo'] or repo_url
-
-                # Repo name can't have spaces.
-                if ' ' not in repo:
-                    # In case spyder-ide/loghub#45 was for example used
-                    if 'http' not in repo:
-                        repo = 'https://github.com/' + repo
-
-                    if '/issues' not in repo:
-                        issue_url = repo + '/issues/' + issue_number
-                    elif repo.endswith('/') and issue_number:
-                        issue_url = repo + issue_number
-                    elif issue_number:
-                        issue_url = repo + '/' + issue_number
-                    else:
-                        issue_url = None
-                else:
-                    issue_url = None
 
+            if reference_index is not None:
+                references = reference_index.references(pr)
+            else:
+                references = pr_references(pr.body, pr_url)
+
+            for issue_url, issue_number in references:
                 # Set the issue data
                 issue_data = {'url': pr_url, 'text': pr_number, 'user': user}
-                if issue_url is not None:
-                    if issue_number in issue_pr_map:
-                        issue_pr_map[issue_url].append(issue_data)
-                    else:
-                        issue_pr_map[issue_url] = [issue_data]
+                issue_pr_map.setdefault(issue_url, []).append(issue_data)
 
-                    pr_data = {'url': issue_url, 'text': issue_number}
-                    pr_issue_map[pr_url].append(pr_data)
+                pr_data = {'url': issue_url, 'text': issue_number}
+                pr_issue_map[pr_url].append(pr_data)
 
             if show_related_issues:
                 pr['loghub_related_issues'] = pr_issue_map[pr_url]
@@ -186,6 +241,93 @@ def filter_issue_label_groups(issues, issue_label_groups):
     return new_filtered_issues, grouped_filtered_issues
 
 
+def _label_group_index(label_groups):
+    """
+    Return the index of label groups by label and the empty groups.
+
+    The index maps each label to the (position, name) of its groups.
+    """
+    index = {}
+    grouped = OrderedDict()
+    for position, label_group_dic in enumerate(label_groups):
+        grouped[label_group_dic['name']] = []
+        index.setdefault(label_group_dic['label'], []).append(
+            (position, label_group_dic['name']))
+    return index, grouped
+
+
+def partition_issues(issues,
+                     issue_label_regex='',
+                     pr_label_regex='',
+                     issue_label_groups=None,
+                     pr_label_groups=None):
+    """
+    Split issues and prs, filtered by label regex and label groups.
+
+    Gives the same result as `filter_issues_by_regex`, `filter_prs_by_regex`
+    and `filter_issue_label_groups` for issues and prs, in a single pass.
+    Items are routed to their label groups through an index by label.
+
+    Returns filtered issues, grouped issues, filtered prs and grouped prs.
+    """
+    issue_pattern = re.compile(issue_label_regex) if issue_label_regex \
+        else None
+    pr_pattern = re.compile(pr_label_regex) if pr_label_regex else None
+    issue_index, grouped_issues = _label_group_index(issue_label_groups or [])
+    pr_index, grouped_prs = _label_group_index(pr_label_groups or [])
+
+    filtered_issues = []
+    filtered_prs = []
+    for issue in issues:
+        labels = issue.get('loghub_label_names')
+        if issue.get('pull_request'):
+            pattern, index, grouped, filtered = (pr_pattern, pr_index,
+                                                 grouped_prs, filtered_prs)
+        else:
+            pattern, index, grouped, filtered = (issue_pattern, issue_index,
+                                                 grouped_issues,
+                                                 filtered_issues)
+
+        if pattern is not None and not pattern.search(' '.join(labels)):
+            continue
+
+        if not grouped:
+            filtered.append(issue)
+            continue
+
+        # Groups are kept in the order given
+        groups = sorted(group for label in set(labels)
+                        for group in index.get(label, ()))
+        for _position, name in groups:
+            grouped[name].append(issue)
+            filtered.append(issue)
+
+    return filtered_issues, grouped_issues, filtered_prs, grouped_prs
+
+
+def group_issues_by_dates(issues, dates):
+    """
+    Group issues in the windows between consecutive sorted `dates`.
+
+    Returns len(dates) + 1 lists, where list `i` holds the issues closed
+    after dates[i - 1] and up to dates[i], keeping their original order.
+    """
+    groups = [[] for _ in range(len(dates) + 1)]
+    for issue in issues:
+        groups[bisect_left(dates, closed_date(issue))].append(issue)
+    return groups
+
+
+def group_issues_by_milestone(issues):
+    """Group issues by milestone title, keeping their original order."""
+    groups = {}
+    for issue in issues:
+        milestone_data = issue.get('milestone')
+        title = milestone_data.get('title') if milestone_data else ''
+        groups.setdefault(title, []).append(issue)
+    return groups
+
+
 def join_label_groups(grouped_issues, grouped_prs, issue_label_groups,
                       pr_label_groups):
     """Combine issue and PR groups in to one dictionary.
@@ -242,150 +384,222 @@ def create_changelog(repo=None,
                      batch=None,
                      show_prs=True,
                      show_related_prs=True,
-                     show_related_issues=True):
-    """Create changelog data for single and batched mode."""
+                     show_related_issues=True,
+                     pool_size=DEFAULT_POOL_SIZE,
+                     use_cache=True,
+                     refresh_cache=False,
+                     api=API_REST,
+                     wait_rate_limit=False,
+                     timeout=TIMEOUT,
+                     retries=DEFAULT_RETRIES,
+                     use_store=False,
+                     store_path=None,
+                     offline=False,
+                     output_file=DEFAULT_OUTPUT_FILE,
+                     echo=True,
+                     keep_text=True):
+    """
+    Create changelog data for single and batched mode.
+
+    Each version is written to `output_file` as soon as it is rendered, and
+    printed too if `echo` is True. The changelog is returned, unless
+    `keep_text` is False to not keep it in memory, then None is returned.
+    """
     if issue_label_groups is None:
         issue_label_groups = []
 
     if pr_label_groups is None:
         pr_label_groups = []
 
+    if offline and zenhub_release:
+        print('LOGHUB: Zenhub releases can not be used offline.\n')
+        sys.exit(1)
+
+    use_cache = use_cache and not offline
+    cache = ResponseCache(refresh=refresh_cache) if use_cache else None
+    store = IssueStore(store_path) if use_store or offline else None
+
     gh = GitHubRepo(
         username=username,
         password=password,
         token=token,
-        repo=repo, )
+        repo=repo,
+        pool_size=pool_size,
+        cache=cache,
+        api=api,
+        wait_rate_limit=wait_rate_limit,
+        timeout=timeout,
+        retries=retries,
+        store=store,
+        offline=offline,
+        fields=template_fields(template_file) if template_file else None, )
+
+    # With both issue and PR label groups only items with a group label are
+    # rendered, so they can be listed by label on the server
+    any_labels = None
+    if issue_label_groups and pr_label_groups:
+        any_labels = list(
+            OrderedDict.fromkeys(group['label'] for group in
+                                 issue_label_groups + pr_label_groups))
+
+    # PR bodies are scanned once for all versions, and once across runs with
+    # a store
+    reference_index = ReferenceIndex(store, repo)
 
-    all_changelogs = []
     version_tag_prefix = 'v'
 
     base_issues = None
+    tag_dates = {}
+    window_issues = {}
+    milestone_issues = {}
     if zenhub_release:
         items = [(None, None, None)]
     elif batch:
         # This will get all the issues, might eat up the api rate limit!
-        base_issues = issues = gh.issues(state='closed', branch=branch)
+        base_issues = issues = gh.issues(
+            state='closed', branch=branch, any_labels=any_labels)
         if batch == 'milestones':
             milestones = [i.get('title') for i in gh.milestones()]
             empty_items = [None] * len(milestones)
             items = list(zip(milestones, empty_items, empty_items))
+
+            # Assign every issue to its milestone in a single pass
+            milestone_issues = group_issues_by_milestone(base_issues)
         elif batch == 'tags':
-            tags = [
-                i.get('ref', '').replace('refs/tags/', '') for i in gh.tags()
-            ]
+            tag_dates = gh.tag_dates()
+            tags = list(tag_dates)
             since_tags = [None] + tags
             until_tags = tags + [None]
             empty_items = [None] * len(since_tags)
             items = list(zip(empty_items, since_tags, until_tags))
+
+            # Assign every issue to its tag window in a single pass
+            groups = group_issues_by_dates(
+                base_issues, [parse_date(tag_dates[tag]) for tag in tags])
+            window_issues = dict(zip(zip(since_tags, until_tags), groups))
     else:
         if milestone:
             items = [(milestone, None, None)]
         else:
             items = [(None, since_tag, until_tag)]
 
-    for (milestone, since_tag, until_tag) in reversed(items):
-        version = until_tag or None
-        closed_at = None
-        since = None
-        until = None
-
-        # Set milestone or from tag
-        if milestone and not since_tag:
-            milestone_data = gh.milestone(milestone)
-            closed_at = milestone_data['closed_at']
-            version = milestone
-
-            if version.startswith(version_tag_prefix):
-                version = version[len(version_tag_prefix):]
-
-        elif not milestone and since_tag:
-            since = gh.tag(since_tag)['tagger']['date']
-            if until_tag:
-                until = gh.tag(until_tag)['tagger']['date']
-                closed_at = until
-
-        if not bool(zenhub_release):
-            # This returns issues and pull requests
-            issues = gh.issues(
-                milestone=milestone,
-                state='closed',
-                since=since,
-                until=until,
-                branch=branch,
-                base_issues=base_issues,
-            )
-        else:
-            version = zenhub_release
-            zh = ZenHub(zenhub_token)
-
-            # Get repo id
-            repo_id = gh.repo.get()['id']
-
-            # Get list of releases and select the right one
-            releases = zh.releases(repo_id)
-            release_id = None
-            for release in releases:
-                if zenhub_release == release['title']:
-                    release_id = release['release_id']
-                    break
-
-            # Get all the specific issues 1 by 1
-            if release_id is not None:
-                zh_issues = zh.issues(release_id)
-
-                # Filter issues that belong to this repository
-                zh_issues = [issue for issue in zh_issues if issue['repo_id'] == repo_id]
-                
-                # Get all issues from github
-                issues = []
-                print('\n{} issues found!'.format(len(zh_issues)))
-                for idx, zh_issue in enumerate(reversed(zh_issues)):
-                    print(idx)
-                    issue = gh.issue(zh_issue['issue_number'])
-                    if issue['state'] == 'closed':
-                        # Add filtered label names inside additional key
-                        issue['loghub_label_names'] = [l['name'] for l in issue.get('labels')]
-                        issues.append(issue)
+    writer = ChangelogWriter(output_file, echo=echo, keep_text=keep_text)
+    try:
+        for (milestone, since_tag, until_tag) in reversed(items):
+            version = until_tag or None
+            closed_at = None
+            since = None
+            until = None
+
+            # Set milestone or from tag
+            if batch == 'tags':
+                closed_at = tag_dates.get(until_tag)
+            elif milestone and not since_tag:
+                milestone_data = gh.milestone(milestone)
+                closed_at = milestone_data['closed_at']
+                version = milestone
+
+                if version.startswith(version_tag_prefix):
+                    version = version[len(version_tag_prefix):]
+
+            elif not milestone and since_tag:
+                since = gh.tag_date(since_tag)
+                if until_tag:
+                    until = gh.tag_date(until_tag)
+                    closed_at = until
+
+            if batch == 'tags':
+                # Issues were already grouped by tag window
+                issues = window_issues[(since_tag, until_tag)]
+            elif batch == 'milestones':
+                issues = milestone_issues.get(milestone, [])
+            elif not bool(zenhub_release):
+                # This returns issues and pull requests
+                issues = gh.issues(
+                    milestone=milestone,
+                    state='closed',
+                    since=since,
+                    until=until,
+                    branch=branch,
+                    base_issues=base_issues,
+                    any_labels=any_labels,
+                )
             else:
-                release_titles = [release['title'] for release in releases]
-                print("Zenhub release not found! Available releases are: {}".format(
-                    release_titles))
-                sys.exit(1)
-
-        # Filter by regex if available
-        filtered_prs = filter_prs_by_regex(issues, pr_label_regex)
-        filtered_issues = filter_issues_by_regex(issues, issue_label_regex)
-
-        # If issue label grouping, filter issues
-        filtered_issues, grouped_issues = filter_issue_label_groups(
-            filtered_issues, issue_label_groups)
-        filtered_prs, grouped_prs = filter_issue_label_groups(
-            filtered_prs, pr_label_groups)
-        label_groups = join_label_groups(grouped_issues, grouped_prs,
-                                         issue_label_groups, pr_label_groups)
-
-        filter_issues_fixed_by_prs(filtered_issues, filtered_prs,
-                                   show_related_prs, show_related_issues)
-
-        ch = render_changelog(
-            repo,
-            filtered_issues,
-            filtered_prs,
-            version,
-            closed_at=closed_at,
-            output_format=output_format,
-            template_file=template_file,
-            label_groups=label_groups,
-            issue_label_groups=grouped_issues,
-            pr_label_groups=grouped_prs,
-            show_prs=show_prs)
-
-        all_changelogs.append(ch)
-
-    changelog = '\n'.join(all_changelogs)
-    write_changelog(changelog=changelog)
-
-    return changelog
+                version = zenhub_release
+                zh = ZenHub(zenhub_token)
+
+                # Get repo id
+                repo_id = gh.repo.get()['id']
+
+                # Get list of releases and select the right one
+                releases = zh.releases(repo_id)
+                release_id = None
+                for release in releases:
+                    if zenhub_release == release['title']:
+                        release_id = release['release_id']
+                        break
+
+                # Get all the specific issues 1 by 1
+                if release_id is not None:
+                    zh_issues = zh.issues(release_id)
+
+                    # Filter issues that belong to this repository
+                    zh_issues = [issue for issue in zh_issues if issue['repo_id'] == repo_id]
+                
+                    # Get all issues from github
+                    issues = []
+                    print('\n{} issues found!'.format(len(zh_issues)))
+                    for idx, zh_issue in enumerate(reversed(zh_issues)):
+                        print(idx)
+                        issue = gh.issue(zh_issue['issue_number'])
+                        if issue['state'] == 'closed':
+                            # Add filtered label names inside additional key
+                            issue['loghub_label_names'] = [l['name'] for l in issue.get('labels')]
+                            issues.append(issue)
+                else:
+                    release_titles = [release['title'] for release in releases]
+                    print("Zenhub release not found! Available releases are: {}".format(
+                        release_titles))
+                    sys.exit(1)
+
+            # Filter by regex and label groups if available
+            (filtered_issues, grouped_issues, filtered_prs,
+             grouped_prs) = partition_issues(issues, issue_label_regex,
+                                             pr_label_regex, issue_label_groups,
+                                             pr_label_groups)
+            label_groups = join_label_groups(grouped_issues, grouped_prs,
+                                             issue_label_groups, pr_label_groups)
+
+            filter_issues_fixed_by_prs(filtered_issues, filtered_prs,
+                                       show_related_prs, show_related_issues,
+                                       reference_index=reference_index)
+
+            ch = generate_changelog(
+                repo,
+                filtered_issues,
+                filtered_prs,
+                version,
+                closed_at=closed_at,
+                output_format=output_format,
+                template_file=template_file,
+                label_groups=label_groups,
+                issue_label_groups=grouped_issues,
+                pr_label_groups=grouped_prs,
+                show_prs=show_prs)
+
+            writer.write(ch)
+    except BaseException:
+        writer.discard()
+        raise
+
+    writer.close()
+    print_stats(gh.stats)
+
+    reference_index.save()
+    if store is not None:
+        store.close()
+
+    return writer.text if keep_text else None
 
 
 def render_changelog(repo,
@@ -400,6 +614,33 @@ def render_changelog(repo,
                      label_groups=None,
                      show_prs=True):
     """Render changelog data on a jinja template."""
+    return ''.join(
+        generate_changelog(
+            repo,
+            issues,
+            prs,
+            version=version,
+            closed_at=closed_at,
+            output_format=output_format,
+            template_file=template_file,
+            issue_label_groups=issue_label_groups,
+            pr_label_groups=pr_label_groups,
+            label_groups=label_groups,
+            show_prs=show_prs))
+
+
+def generate_changelog(repo,
+                       issues,
+                       prs,
+                       version=None,
+                       closed_at=None,
+                       output_format='changelog',
+                       template_file=None,
+                       issue_label_groups=None,
+                       pr_label_groups=None,
+                       label_groups=None,
+                       show_prs=True):
+    """Render changelog data on a jinja template, chunk by chunk."""
     # Header
     if not version:
         version = '<RELEASE_VERSION>'
@@ -434,12 +675,9 @@ def render_changelog(repo,
             else:
                 filepath = RELEASE_TEMPLATE_PATH
 
-    with open(filepath) as f:
-        data = f.read()
-
     repo_owner, repo_name = repo.split('/')
-    template = Template(data)
-    rendered = template.render(
+    template = template_environment().get_template(os.path.abspath(filepath))
+    return template.generate(
         issues=issues,
         pull_requests=prs,
         version=version,
@@ -452,14 +690,84 @@ def render_changelog(repo,
         pr_label_groups=pr_label_groups,
         show_prs=show_prs)
 
-    return rendered
+
+def print_stats(stats):
+    """Print the run statistics of the Github API requests."""
+    print('LOGHUB: {0} API requests, {1} retries, {2} cached responses, '
+          '{3} rate limit waits\n'.format(
+              stats.get('requests', 0), stats.get('retries', 0),
+              stats.get('cache_hits', 0), stats.get('rate_limit_waits', 0)))
 
 
-def write_changelog(changelog, output_file='CHANGELOG.temp'):
+def write_changelog(changelog, output_file=DEFAULT_OUTPUT_FILE):
     """Output rendered result to prompt and file."""
-    print('#' * 79)
-    print(changelog)
-    print('#' * 79)
+    writer = ChangelogWriter(output_file)
+    writer.write([changelog])
+    writer.close()
+
+
+class ChangelogWriter(object):
+    """
+    Write changelog sections to a file as they are rendered.
+
+    Sections go to a temporary file next to `output_file`, which replaces it
+    once all of them are written, so failed runs leave no partial output.
+    If `echo` is True, sections are also printed between rulers, and if
+    `keep_text` is True they are kept to be given by `text`.
+    """
 
-    with codecs.open(output_file, "w", "utf-8") as f:
-        f.write(changelog)
+    def __init__(self, output_file=DEFAULT_OUTPUT_FILE, echo=True,
+                 keep_text=False):
+        """Write changelog sections to a file as they are rendered."""
+        self._output_file = output_file
+        self._temp_file = '{0}.{1}.tmp'.format(output_file, os.getpid())
+        self._file = io.open(
+            self._temp_file,
+            'w',
+            encoding='utf-8',
+            buffering=WRITE_BUFFER_SIZE)
+        self._echo = echo
+        self._keep_text = keep_text
+        self._sections = 0
+        self._chunks = []
+
+        if echo:
+            print('#' * 79)
+
+    @property
+    def text(self):
+        """Return the written sections, if kept."""
+        return ''.join(self._chunks)
+
+    def _write(self, text):
+        """Write `text` to the file, the prompt if echoed and kept text."""
+        self._file.write(text)
+        if self._echo:
+            sys.stdout.write(text)
+        if self._keep_text:
+            self._chunks.append(text)
+
+    def write(self, chunks):
+        """Write a section given by its rendered `chunks`."""
+        if self._sections:
+            self._write(u'\n')
+        self._sections += 1
+
+        for chunk in chunks:
+            self._write(chunk)
+
+    def close(self):
+        """Finish writing and move the output to its final path."""
+        self._file.close()
+        replace_file(self._temp_file, self._output_file)
+        if self._echo:
+            sys.stdout.write('\n')
+            print('#' * 79)
+
+    def discard(self):
+        """Stop writing and remove the partial output."""
+        self._file.close()
+        try:
+            os.remove(self._temp_file)
+        except OSError:
+            pass
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Github GraphQL queries for issues, pull requests and tags."""
+
+# Standard library imports
+import datetime
+
+# Local imports
+from loghub.core.models import parse_date
+from loghub.external.github import JsonObject
+
+# Constants
+GHOST_USER = 'ghost'
+
+_ITEM_FIELDS = '''
+        number
+        title
+        url
+        state
+        createdAt
+        updatedAt
+        closedAt
+        author { login url }
+        labels(first: 100) { nodes { name } }
+        milestone { number title closedAt }
+'''
+
+# Issue bodies are only needed by some custom templates. Issues are filtered
+# by milestone number and update date on the server.
+ISSUES_QUERY = '''
+query($owner: String!, $name: String!, $cursor: String,
+      $states: [IssueState!], $labels: [String!], $milestone: String,
+      $since: DateTime, $body: Boolean = false) {
+  repository(owner: $owner, name: $name) {
+    items: issues(first: 100, after: $cursor, states: $states,
+                  labels: $labels,
+                  filterBy: {milestoneNumber: $milestone, since: $since},
+                  orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {%s
+        body @include(if: $body)
+      }
+    }
+  }
+}
+''' % _ITEM_FIELDS
+
+# Pull requests can't be filtered by update date, so they are listed by most
+# recently updated to stop at the first one updated before it
+_PULL_REQUESTS_ITEMS = '''
+    items: pullRequests(first: 100, after: $cursor, states: $states,
+                        labels: $labels,
+                        orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {%s
+        body
+        merged
+        mergedAt
+        baseRefName
+      }
+    }
+''' % _ITEM_FIELDS
+
+PULL_REQUESTS_QUERY = '''
+query($owner: String!, $name: String!, $cursor: String,
+      $states: [PullRequestState!], $labels: [String!]) {
+  repository(owner: $owner, name: $name) {%s
+  }
+}
+''' % _PULL_REQUESTS_ITEMS
+
+# Pull requests of a milestone are listed from the milestone itself
+MILESTONE_PULL_REQUESTS_QUERY = '''
+query($owner: String!, $name: String!, $cursor: String,
+      $states: [PullRequestState!], $labels: [String!], $milestone: Int!) {
+  repository(owner: $owner, name: $name) {
+    milestone(number: $milestone) {%s
+    }
+  }
+}
+''' % _PULL_REQUESTS_ITEMS
+
+TAGS_QUERY = '''
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    items: refs(refPrefix: "refs/tags/", first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        target {
+          ... on Tag { tagger { date } }
+          ... on Commit { committedDate }
+        }
+      }
+    }
+  }
+}
+'''
+
+ISSUE_STATES = {
+    'open': ['OPEN'],
+    'closed': ['CLOSED'],
+}
+PULL_REQUEST_STATES = {
+    'open': ['OPEN'],
+    'closed': ['CLOSED', 'MERGED'],
+}
+
+
+def to_utc(timestamp):
+    """Convert an ISO timestamp with an UTC offset to the REST format."""
+    if timestamp.endswith('Z'):
+        return timestamp
+
+    date = parse_date(timestamp[:19] + 'Z')
+    offset = timestamp[19:]
+    sign = -1 if offset.startswith('-') else 1
+    hours, minutes = offset[1:].split(':')
+    date -= sign * datetime.timedelta(hours=int(hours), minutes=int(minutes))
+    return date.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def tag_date(node):
+    """Return the date of a tag ref node, annotated or lightweight."""
+    target = node.get('target') or {}
+    tagger = target.get('tagger')
+    if tagger:
+        return to_utc(tagger['date'])
+    if target.get('committedDate'):
+        return to_utc(target['committedDate'])
+    return None
+
+
+def to_rest(node):
+    """Convert a GraphQL issue or pull request node to the REST shape."""
+    author = node.get('author') or {
+        'login': GHOST_USER,
+        'url': 'https://github.com/{0}'.format(GHOST_USER),
+    }
+    milestone = node.get('milestone')
+    if milestone:
+        milestone = JsonObject(
+            number=milestone['number'],
+            title=milestone['title'],
+            closed_at=milestone['closedAt'])
+
+    state = node['state'].lower()
+    item = JsonObject(
+        number=node['number'],
+        title=node['title'],
+        html_url=node['url'],
+        body=node.get('body'),
+        state='closed' if state == 'merged' else state,
+        created_at=node['createdAt'],
+        updated_at=node['updatedAt'],
+        closed_at=node['closedAt'],
+        user=JsonObject(login=author['login'], html_url=author['url']),
+        labels=[JsonObject(name=l['name']) for l in node['labels']['nodes']],
+        milestone=milestone)
+
+    if 'baseRefName' in node:
+        item['pull_request'] = JsonObject(html_url=node['url'])
+
+    return item
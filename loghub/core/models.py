@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Compact issue and pull request records."""
+
+# Standard library imports
+from bisect import bisect_left, bisect_right
+import datetime
+import time
+
+# Constants
+ISO_DATE_LENGTH = len('2016-10-10T08:08:08Z')
+
+
+def utc_now():
+    """Return the current UTC date without timezone, like parsed dates."""
+    try:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    except AttributeError:
+        # Python 2
+        return datetime.datetime(*time.gmtime()[:6])
+    return now.replace(tzinfo=None, microsecond=0)
+
+
+def parse_date(string):
+    """Convert ISO date string to datetime object."""
+    # Fast path for the fixed format used by Github
+    if len(string) == ISO_DATE_LENGTH and string[10] == 'T':
+        return datetime.datetime(
+            int(string[0:4]), int(string[5:7]), int(string[8:10]),
+            int(string[11:13]), int(string[14:16]), int(string[17:19]))
+
+    parts = string.split('T')
+    date_parts = parts[0]
+    time_parts = parts[1][:-1]
+    year, month, day = [int(i) for i in date_parts.split('-')]
+    hour, minutes, seconds = [int(i) for i in time_parts.split(':')]
+    return datetime.datetime(year, month, day, hour, minutes, seconds)
+
+
+def closed_date(issue):
+    """Return the closing datetime of an issue, parsed only once."""
+    date = issue.get('loghub_closed_date')
+    if date is None:
+        date = parse_date(issue['closed_at'])
+    return date
+
+
+class Record(object):
+    """
+    Slotted record supporting both attribute and item access.
+
+    Records keep only the fields loghub uses, so they take a fraction of the
+    memory of the parsed json payloads while working the same way in the
+    formatter and the templates.
+    """
+
+    __slots__ = ()
+    _defaults = {}
+
+    def __init__(self, **kwargs):
+        """Slotted record supporting both attribute and item access."""
+        for key in self.__slots__:
+            value = kwargs.get(key, self._defaults.get(key))
+            object.__setattr__(self, key, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __repr__(self):
+        fields = ', '.join(
+            '{0}={1!r}'.format(key, getattr(self, key))
+            for key in self.__slots__)
+        return '{0}({1})'.format(type(self).__name__, fields)
+
+    def get(self, key, default=None):
+        """Return the value of field `key`, or `default` if not a field."""
+        return getattr(self, key, default) if key in self else default
+
+    def keys(self):
+        """Return the field names."""
+        return list(self.__slots__)
+
+
+class PayloadRecord(Record):
+    """
+    Record keeping additional payload fields in its `extra` field.
+
+    Additional fields, like the ones used by a custom template, are looked up
+    like any other field.
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, key):
+        # Only called for names that are not fields
+        extra = object.__getattribute__(self, 'extra')
+        if extra and key in extra:
+            return extra[key]
+        raise AttributeError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ or bool(self.extra and key in self.extra)
+
+
+class User(PayloadRecord):
+    """Github user record."""
+
+    __slots__ = ('login', 'html_url', 'extra')
+
+
+class Label(PayloadRecord):
+    """Github label record."""
+
+    __slots__ = ('name', 'extra')
+
+
+class Milestone(PayloadRecord):
+    """Github milestone record."""
+
+    __slots__ = ('number', 'title', 'closed_at', 'extra')
+
+
+class PullRequest(PayloadRecord):
+    """Pull request reference of a Github issue record."""
+
+    __slots__ = ('html_url', 'extra')
+
+
+class Issue(PayloadRecord):
+    """Github issue or pull request record."""
+
+    __slots__ = (
+        'number',
+        'title',
+        'html_url',
+        'state',
+        'body',
+        'created_at',
+        'updated_at',
+        'closed_at',
+        'loghub_closed_date',
+        'user',
+        'labels',
+        'milestone',
+        'pull_request',
+        'loghub_label_names',
+        'loghub_related_pulls',
+        'loghub_related_issues',
+        'extra',
+    )
+    _defaults = {
+        'labels': (),
+        'loghub_label_names': (),
+        'loghub_related_pulls': (),
+        'loghub_related_issues': (),
+    }
+
+
+class IssueProjector(object):
+    """
+    Convert raw issue payloads into compact `Issue` records.
+
+    Users, labels and milestones repeat across issues, so a single record is
+    kept and shared for each of them. The body is only kept for pull
+    requests, where references to fixed issues are searched. Any other
+    payload `fields`, like the ones used by a custom template, are kept in
+    the `extra` field of the records, nested ones included.
+    """
+
+    def __init__(self, fields=None):
+        """Convert raw issue payloads into compact `Issue` records."""
+        self._users = {}
+        self._labels = {}
+        self._milestones = {}
+
+        fields = set(fields or ())
+        self.issue_body = 'body' in fields
+        self._fields = dict(
+            (record, sorted(fields - set(record.__slots__)))
+            for record in (Issue, User, Label, Milestone, PullRequest))
+
+    def _extra(self, record, data):
+        """Return the additional fields of `data` kept for a `record`."""
+        extra = dict((key, data[key]) for key in self._fields[record]
+                     if key in data)
+        return extra or None
+
+    def _user(self, data):
+        """Return the shared record for user `data`."""
+        if not data:
+            return None
+        login = data.get('login')
+        user = self._users.get(login)
+        if user is None:
+            user = self._users[login] = User(
+                login=login,
+                html_url=data.get('html_url'),
+                extra=self._extra(User, data))
+        return user
+
+    def _label(self, data):
+        """Return the shared record for label `data`."""
+        name = data.get('name')
+        label = self._labels.get(name)
+        if label is None:
+            label = self._labels[name] = Label(
+                name=name, extra=self._extra(Label, data))
+        return label
+
+    def _milestone(self, data):
+        """Return the shared record for milestone `data`."""
+        if not data:
+            return None
+        key = (data.get('number'), data.get('title'))
+        milestone = self._milestones.get(key)
+        if milestone is None:
+            milestone = self._milestones[key] = Milestone(
+                number=data.get('number'),
+                title=data.get('title'),
+                closed_at=data.get('closed_at'),
+                extra=self._extra(Milestone, data))
+        return milestone
+
+    def __call__(self, data):
+        """Return the `Issue` record for the issue payload `data`."""
+        if isinstance(data, Issue):
+            return data
+
+        labels = tuple(self._label(l) for l in data.get('labels') or ())
+        closed_at = data.get('closed_at')
+        pull_request = data.get('pull_request')
+        if pull_request:
+            pull_request = PullRequest(
+                html_url=pull_request.get('html_url'),
+                extra=self._extra(PullRequest, pull_request))
+
+        body = None
+        if pull_request or self.issue_body:
+            body = data.get('body')
+
+        return Issue(
+            number=data.get('number'),
+            title=data.get('title'),
+            html_url=data.get('html_url'),
+            state=data.get('state'),
+            body=body,
+            created_at=data.get('created_at'),
+            updated_at=data.get('updated_at'),
+            closed_at=closed_at,
+            loghub_closed_date=parse_date(closed_at) if closed_at else None,
+            user=self._user(data.get('user')),
+            labels=labels,
+            milestone=self._milestone(data.get('milestone')),
+            pull_request=pull_request or None,
+            loghub_label_names=[l.name for l in labels],
+            extra=self._extra(Issue, data))
+
+    def project(self, issues):
+        """Return `Issue` records for all the payloads in `issues`."""
+        return [self(issue) for issue in issues]
+
+
+class ClosedDateIndex(object):
+    """
+    Index of issues sorted by closing date.
+
+    Issues closed in a date window are found with a binary search instead of
+    comparing the dates of all the issues.
+    """
+
+    def __init__(self, issues):
+        """Index of issues sorted by closing date."""
+        self.issues = issues
+        entries = sorted(
+            (closed_date(issue), position)
+            for position, issue in enumerate(issues)
+            if issue.get('closed_at'))
+        self._dates = [date for date, _position in entries]
+        self._positions = [position for _date, position in entries]
+
+    def window(self, since=None, until=None):
+        """
+        Return issues closed between `since` and `until` datetimes, both
+        included, keeping their original order.
+        """
+        start = bisect_left(self._dates, since) if since else 0
+        end = bisect_right(self._dates, until) if until else len(self._dates)
+        positions = sorted(self._positions[start:end])
+        return [self.issues[position] for position in positions]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Linear time extraction of issues referenced as fixed by pull requests."""
+
+# Standard library imports
+import re
+
+# Constants
+KEYWORDS = (
+    'close',
+    'closes',
+    'fix',
+    'fixes',
+    'fixed',
+    'resolve',
+    'resolves',
+    'resolved',
+)
+KEYWORD_PATTERN = re.compile(r'(?:' + r'|'.join(KEYWORDS) + r') ',
+                             re.IGNORECASE)
+DIGITS_PATTERN = re.compile(r'\d*')
+
+
+def _line_references(line):
+    """Yield the (repo, number) references found in a single line."""
+    # Position of the next `#` at or after the current one, -1 if none
+    next_hash = line.find('#')
+    last_slash = line.rfind('/')
+
+    position = 0
+    while True:
+        match = KEYWORD_PATTERN.search(line, position)
+        if match is None:
+            break
+
+        start = match.end()
+        if 0 <= next_hash < start:
+            next_hash = line.find('#', start)
+
+        if next_hash >= 0:
+            # `owner/repo#123` or `#123`, up to the first `#` of the line
+            repo = line[start:next_hash]
+            number = DIGITS_PATTERN.match(line, next_hash + 1).group()
+            position = next_hash + 1 + len(number)
+        elif last_slash >= start:
+            # Issue url, up to the last `/` of the line
+            repo = line[start:last_slash]
+            number = DIGITS_PATTERN.match(line, last_slash + 1).group()
+            position = last_slash + 1 + len(number)
+        else:
+            # No reference can follow in the rest of the line
+            break
+
+        yield repo, number
+
+
+def find_references(body):
+    """
+    Return the (repo, number) pairs of issues referenced as fixed in `body`.
+
+    References are introduced by a keyword like `fixes` followed by a space
+    and are found in a single pass over each line, so long bodies like
+    pasted logs do not cause any backtracking. `repo` is empty for `#123`
+    references and `number` is empty when not given.
+    """
+    references = []
+    for line in body.split('\n'):
+        references.extend(_line_references(line))
+    return references
+
+
+def reference_url(repo, number, repo_url):
+    """
+    Return the url of a referenced issue, or None if it is not valid.
+
+    `repo_url` is the issues url of the repository of the pull request, used
+    for references without a repository.
+    """
+    repo = repo or repo_url
+    number = number or ''
+
+    # Repo name can't have spaces.
+    if ' ' in repo:
+        return None
+
+    # In case spyder-ide/loghub#45 was for example used
+    if 'http' not in repo:
+        repo = 'https://github.com/' + repo
+
+    if '/issues' not in repo:
+        return repo + '/issues/' + number
+    elif repo.endswith('/') and number:
+        return repo + number
+    elif number:
+        return repo + '/' + number
+    return None
+
+
+def pr_references(body, pr_url):
+    """
+    Return the (issue url, issue number) pairs of issues fixed by a PR.
+
+    Blank lines and markdown comments of the PR `body` are ignored.
+    """
+    lines = [l for l in (body or '').splitlines()
+             if l and not l.startswith('<!---')]
+    repo_url = pr_url.split('/pull/')[0] + '/issues/'
+
+    references = []
+    for repo, number in find_references('\n'.join(lines)):
+        url = reference_url(repo, number, repo_url)
+        if url is not None:
+            references.append((url, number))
+    return references
+
+
+class ReferenceIndex(object):
+    """
+    Index of the issues referenced as fixed by each pull request.
+
+    The body of a PR is only scanned the first time it is seen. With a local
+    store, references are kept across runs and only extracted again for PRs
+    updated since.
+    """
+
+    def __init__(self, store=None, repo=None):
+        """Index of the issues referenced as fixed by each pull request."""
+        self._store = store
+        self._repo = repo
+        self._changed = {}
+        if store is not None:
+            self._references = store.load_references(repo)
+        else:
+            self._references = {}
+
+    def references(self, pr):
+        """Return the (issue url, issue number) pairs fixed by `pr`."""
+        updated_at = pr.get('updated_at')
+        entry = self._references.get(pr['number'])
+        if entry is not None and updated_at and entry[0] == updated_at:
+            return entry[1]
+
+        references = pr_references(pr.get('body'), pr['html_url'])
+        self._references[pr['number']] = self._changed[pr['number']] = (
+            updated_at, references)
+        return references
+
+    def save(self):
+        """Save the references extracted since the last save to the store."""
+        if self._store is not None and self._changed:
+            self._store.save_references(self._repo, self._changed)
+        self._changed = {}
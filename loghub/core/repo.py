@@ -10,40 +10,156 @@
 from __future__ import print_function
 
 # Standard library imports
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 import datetime
+import functools
+import re
 import sys
 import time
 
 # Local imports
-from loghub.external.github import ApiError, ApiNotFoundError, GitHub
+from loghub.core import graphql
+from loghub.core.models import (ClosedDateIndex, IssueProjector,
+                                 closed_date, parse_date, utc_now)
+from loghub.core.store import issue_row
+from loghub.external.github import (DEFAULT_POOL_SIZE, DEFAULT_RETRIES,
+                                    TIMEOUT, ApiConnectionError, ApiError,
+                                    ApiNotFoundError, ApiRateLimitError,
+                                    GitHub, JsonObject)
+
+# Constants
+PER_PAGE = 100
+
+# Above this number of PRs, the size of the bulk listing of closed PRs is
+# checked to find whether it takes fewer requests than one per PR
+BULK_PRS_THRESHOLD = 2
+
+# Data sources for issues and pull requests
+API_REST = 'rest'
+API_GRAPHQL = 'graphql'
+API_SEARCH = 'search'
+APIS = (API_REST, API_GRAPHQL, API_SEARCH)
+
+# The search api gives at most this number of results for a query
+SEARCH_MAX_RESULTS = 1000
+
+# Lower bound of the closing dates searched when none is given
+SEARCH_MIN_DATE = '2008-01-01T00:00:00Z'
+
+# Windows with incomplete search results are not split below this length
+SEARCH_MIN_WINDOW = datetime.timedelta(days=1)
+
+# Rate limit resource of the search api
+SEARCH_RESOURCE = 'search'
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+LINK_LAST_PAGE_PATTERN = re.compile(r'[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+
+def exit_on_rate_limit(method):
+    """
+    Decorate a `GitHubRepo` method to report exceeded rate limits and exit.
+
+    Without waiting for rate limits, the client raises `ApiRateLimitError`
+    for requests over the budget, including the ones of worker threads.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except ApiRateLimitError as error:
+            self._rate_limit_exit(error.reset, error.resource)
+
+    return wrapper
 
 
 class GitHubRepo(object):
     """Github repository wrapper."""
 
-    def __init__(self, username=None, password=None, token=None, repo=None):
+    def __init__(self,
+                 username=None,
+                 password=None,
+                 token=None,
+                 repo=None,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 cache=None,
+                 api=API_REST,
+                 wait_rate_limit=False,
+                 timeout=TIMEOUT,
+                 retries=DEFAULT_RETRIES,
+                 store=None,
+                 offline=False,
+                 fields=None):
         """Github repository wrapper."""
         self._username = username
         self._password = password
         self._token = token
+        self._api = api
+        self._wait_rate_limit = wait_rate_limit
+
+        # Issue payloads are kept as compact records, with any additional
+        # payload `fields` needed for rendering
+        self._projector = IssueProjector(fields=fields)
 
+        # Closing date index of the last base issues given
+        self._date_index = None
+
+        # Milestones indexed by title
+        self._milestone_index = None
+
+        # Tag refs and tag dates in chronological order
+        self._tags = None
+        self._tag_dates = None
+
+        # Merge metadata of closed PRs, indexed by number
+        self._pr_index = None
+        self._closed_prs_count = None
+
+        # Local store synced incrementally across runs, or used as the only
+        # data source when offline
+        self._store = store
+        self._offline = offline
+
+        # Concurrent requests are bounded by the number of pooled connections
+        self._workers = max(pool_size, 1)
+
+        # Connections are kept alive and reused for the repo lifetime
         self.gh = GitHub(
             username=username,
             password=password,
-            access_token=token, )
+            access_token=token,
+            pool_size=pool_size,
+            cache=cache,
+            wait_on_rate_limit=wait_rate_limit,
+            timeout=timeout,
+            retries=retries, )
         repo_organization, repo_name = repo.split('/')
         self._repo_organization = repo_organization
         self._repo_name = repo_name
+        self._repo_full_name = repo
         self.repo = self.gh.repos(repo_organization)(repo_name)
 
         # Check username and repo name
-        self._check_user()
-        self._check_repo_name()
+        if offline:
+            self._check_store()
+        else:
+            self._check_user()
+            self._check_repo_name()
+            self._check_api()
+
+    @property
+    def stats(self):
+        """Return the run statistics of the Github API requests."""
+        return self.gh.stats
 
     def _check_user(self):
         """Check if the supplied username is valid."""
         try:
             self.gh.users(self._repo_organization).get()
+        except ApiConnectionError as error:
+            print('LOGHUB: Could not connect to Github: {0}\n'.format(
+                error.error))
+            sys.exit(1)
         except ApiNotFoundError:
             print('LOGHUB: Organization/user `{}` seems to be '
                   'invalid.\n'.format(self._repo_organization))
@@ -65,122 +181,701 @@ class GitHubRepo(object):
         except ApiError:
             self._check_rate()
 
-    def _check_rate(self):
+    def _check_api(self):
+        """Check if the selected api can be used with the credentials."""
+        if self._api == API_GRAPHQL and not self._token:
+            print('LOGHUB: The GraphQL api requires a valid token!\n')
+            sys.exit(1)
+
+    def _check_store(self):
+        """Check if the repo data is available in the local store."""
+        if self._store is None or \
+                self._store.last_sync(self._repo_full_name, 'issues') is None:
+            print('LOGHUB: No local data found for repository `{0}`. Run '
+                  'loghub with --store first to fetch it.\n'.format(
+                      self._repo_full_name))
+            sys.exit(1)
+
+    def _check_offline_data(self, data, kind):
+        """Check if `kind` data was stored locally and return it."""
+        if not data:
+            print('LOGHUB: No local {0} found for repository `{1}`. Run '
+                  'loghub with --store first to fetch them.\n'.format(
+                      kind, self._repo_full_name))
+            sys.exit(1)
+        return data
+
+    def _check_rate(self, resource='core'):
         """Check and handle if api rate limit has been exceeded."""
-        if self.gh.x_ratelimit_remaining == 0:
-            reset_struct = time.gmtime(self.gh.x_ratelimit_reset)
-            reset_format = time.strftime('%Y/%m/%d %H:%M', reset_struct)
+        # Requests are throttled and held until the reset by the client
+        if self._wait_rate_limit or self._offline:
+            return
+
+        if resource == 'core':
+            remaining = self.gh.x_ratelimit_remaining
+            reset = self.gh.x_ratelimit_reset
+        else:
+            remaining, reset = self.gh.rate_limit(resource)
+
+        if remaining == 0:
+            self._rate_limit_exit(reset, resource)
+
+    def _rate_limit_exit(self, reset, resource='core'):
+        """Report an exceeded api rate limit and exit."""
+        reset_struct = time.gmtime(reset)
+        reset_format = time.strftime('%Y/%m/%d %H:%M', reset_struct)
+        if resource == 'core':
             print('LOGHUB: GitHub API rate limit exceeded!')
-            print('LOGHUB: GitHub API rate limit resets on '
-                  '{}'.format(reset_format))
-            if not self._username and not self._password or not self._token:
-                print('LOGHUB: Try running loghub with user/password or '
-                      'a valid token.\n')
-            sys.exit(1)
+        else:
+            print('LOGHUB: GitHub {0} API rate limit '
+                  'exceeded!'.format(resource))
+        print('LOGHUB: GitHub API rate limit resets on '
+              '{}'.format(reset_format))
+        if not self._username and not self._password or not self._token:
+            print('LOGHUB: Try running loghub with user/password or '
+                  'a valid token.\n')
+        sys.exit(1)
 
-    def _filter_milestone(self, issues, milestone):
-        """Filter out all issues in milestone."""
+    @exit_on_rate_limit
+    def _map(self, func, items):
+        """Apply `func` to all `items` concurrently, keeping their order."""
+        items = list(items)
+        if len(items) < 2 or self._workers == 1:
+            return [func(item) for item in items]
+
+        def call(item):
+            # Pool workers only forward `Exception`, so exits and rate limit
+            # errors are all passed back to be raised here, once
+            try:
+                return False, func(item)
+            except BaseException as error:
+                return True, error
+
+        pool = ThreadPool(min(self._workers, len(items)))
+        try:
+            results = pool.map(call, items)
+        finally:
+            pool.close()
+            pool.join()
+
+        for failed, result in results:
+            if failed:
+                raise result
+        return [result for _failed, result in results]
+
+    @staticmethod
+    def _last_page(headers):
+        """Return the last page number given by the `Link` header."""
+        match = LINK_LAST_PAGE_PATTERN.search(headers.get('Link', ''))
+        return int(match.group(1)) if match else 1
+
+    @exit_on_rate_limit
+    def _get_pages(self, endpoint, transform=None, **kwargs):
+        """
+        Return all the items of a paginated `endpoint`.
+
+        The first page gives the number of pages through its `Link` header,
+        the remaining ones are fetched concurrently. If given, `transform` is
+        applied to each page as soon as it is parsed, so the full payloads of
+        all the pages are never kept at once.
+        """
+        transform = transform or (lambda items: items)
+        result, headers = endpoint.with_headers(
+            page=1, per_page=PER_PAGE, **kwargs)
+        pages = [transform(result)]
+
+        last_page = self._last_page(headers)
+        if last_page > 1:
+            pages += self._map(
+                lambda page: transform(
+                    endpoint(page=page, per_page=PER_PAGE, **kwargs)),
+                range(2, last_page + 1))
+
+        return [item for page in pages for item in page]
+
+    @exit_on_rate_limit
+    def _get_pages_until(self, endpoint, until, transform=None, **kwargs):
+        """
+        Return the items of a paginated `endpoint` created up to `until`.
+
+        Items are listed by ascending creation date one page at a time, and
+        listing stops at the first page with items created after `until`.
+        """
+        transform = transform or (lambda items: items)
+        kwargs.update(sort='created', direction='asc')
+        items = []
+        page = 1
+        while True:
+            result = endpoint(page=page, per_page=PER_PAGE, **kwargs)
+            created = [item for item in result if item['created_at'] <= until]
+            items += transform(created)
+            if len(result) < PER_PAGE or len(created) < len(result):
+                break
+            page += 1
+
+        return items
+
+    def _rest_issues(self, any_labels=None, until=None, **kwargs):
+        """
+        Return Issues and Pull Requests using the REST api.
+
+        Filters are pushed to the server where possible. The `labels`
+        parameter matches items with all the labels given, so items with
+        any of `any_labels` are listed with a query per label. Items are
+        always created before being closed, so for items closed `until` a
+        date the listing stops at the ones created after it.
+        """
+        queries = [kwargs]
+        if any_labels:
+            queries = [
+                dict(kwargs, labels=','.join(l for l in
+                                             (kwargs.get('labels'), label)
+                                             if l))
+                for label in any_labels
+            ]
+
+        sorted_query = kwargs.get('sort') or kwargs.get('direction')
+        stop_early = bool(until) and not sorted_query
+        if stop_early:
+            queries = [dict(query, until=until) for query in queries]
+        fetch = self._get_pages_until if stop_early else self._get_pages
+
+        results = [
+            fetch(
+                self.repo.issues.get,
+                transform=self._projector.project,
+                **query) for query in queries
+        ]
+        if len(results) == 1 and not stop_early:
+            return results[0]
+
+        # Merge the queries and restore the default newest first order
+        issues = dict(
+            (issue['number'], issue) for result in results
+            for issue in result)
+        return [issues[number] for number in sorted(issues, reverse=True)]
+
+    @exit_on_rate_limit
+    def _graphql_items(self, query, updated_since=None, **kwargs):
+        """
+        Return all nodes of a paginated GraphQL query.
+
+        For queries listing nodes by most recently updated, paging stops at
+        the first page reaching nodes updated before `updated_since`.
+        """
+        variables = {
+            'owner': self._repo_organization,
+            'name': self._repo_name,
+            'cursor': None,
+        }
+        variables.update(kwargs)
+        nodes = []
+        while True:
+            result = self.gh.graphql.post(query=query, variables=variables)
+            if result.get('errors'):
+                messages = [error['message'] for error in result['errors']]
+                print('LOGHUB: GraphQL query failed: {0}\n'.format(
+                    '; '.join(messages)))
+                sys.exit(1)
+
+            # Items of milestone queries are nested in the milestone
+            repository = result['data']['repository']
+            items = (repository.get('milestone') or repository)['items']
+            nodes += items['nodes']
+            if not items['pageInfo']['hasNextPage']:
+                break
+            if updated_since and items['nodes'] and \
+                    items['nodes'][-1]['updatedAt'] < updated_since:
+                break
+            variables['cursor'] = items['pageInfo']['endCursor']
+
+        return nodes
+
+    def _graphql_issues(self, state=None, labels=None, since=None,
+                        milestone=None):
+        """
+        Return Issues and Pull Requests using the GraphQL api.
+
+        Items have the same shape as the ones given by the REST api. The
+        merge status and base branch of PRs are retrieved with them, so PRs
+        need no additional requests to be filtered. Only the items of the
+        `milestone` number, if given, are listed.
+        """
+        label_names = [l for l in (labels or '').split(',') if l]
+
+        # The labels argument matches any of the labels, so only a single
+        # label can be filtered on the server
+        server_labels = label_names if len(label_names) == 1 else None
+        issue_variables = dict(
+            states=graphql.ISSUE_STATES.get(state),
+            labels=server_labels,
+            since=since,
+            body=self._projector.issue_body)
+        pr_variables = dict(
+            states=graphql.PULL_REQUEST_STATES.get(state),
+            labels=server_labels,
+            updated_since=since)
         if milestone:
-            for issue in issues[:]:
-                milestone_data = issue.get('milestone', {})
-                if milestone_data:
-                    issue_milestone_title = milestone_data.get('title')
-                else:
-                    issue_milestone_title = ''
+            issue_variables['milestone'] = str(milestone)
+            pr_variables['milestone'] = milestone
+            pr_query = graphql.MILESTONE_PULL_REQUESTS_QUERY
+        else:
+            pr_query = graphql.PULL_REQUESTS_QUERY
+
+        queries = [
+            (graphql.ISSUES_QUERY, issue_variables),
+            (pr_query, pr_variables),
+        ]
+        results = self._map(
+            lambda q: self._graphql_items(q[0], **q[1]), queries)
+
+        pr_index = {}
+        issues = []
+        for node in results[0] + results[1]:
+            if 'baseRefName' in node:
+                pr_index[node['number']] = {
+                    'merged_at': node['mergedAt'],
+                    'base_ref': node['baseRefName'],
+                }
+
+            issue = self._projector(graphql.to_rest(node))
+            names = [l['name'] for l in issue['labels']]
+            if any(l not in names for l in label_names):
+                continue
+            if since and issue['updated_at'] < since:
+                continue
+            issues.append(issue)
+
+        if self._pr_index is None:
+            self._pr_index = {}
+        self._pr_index.update(pr_index)
+
+        return sorted(issues, key=lambda i: i['number'], reverse=True)
+
+    def _sync_issues(self, since=None):
+        """
+        Return closed Issues and Pull Requests from the local store.
 
-                if issue_milestone_title != milestone:
-                    issues.remove(issue)
+        The first sync fetches all the closed items, later ones only the
+        items updated since the last sync, which may have been reopened.
+        Pages are serialized for the store and projected as they are
+        fetched, so the full payloads of all the pages are never kept.
+        """
+        repo = self._repo_full_name
+        last_sync = self._store.last_sync(repo, 'issues')
+
+        def transform(page):
+            return [(issue_row(issue), self._projector(issue))
+                    for issue in page]
+
+        if last_sync is None:
+            fetched = self._get_pages(
+                self.repo.issues.get, transform=transform, state='closed')
+        else:
+            fetched = self._get_pages(
+                self.repo.issues.get,
+                transform=transform,
+                state='all',
+                since=last_sync)
+
+        self._store.save_issue_rows(repo, [row for row, _issue in fetched])
+        updated = [issue['updated_at'] for _row, issue in fetched]
+        if updated:
+            self._store.set_last_sync(repo, 'issues', max(updated))
+
+        if last_sync is None:
+            # All the closed items were just fetched
+            issues = [
+                issue for _row, issue in fetched
+                if not since or issue['updated_at'] >= since
+            ]
+            return sorted(issues, key=lambda i: i['number'], reverse=True)
+
+        return self._store.load_issues(
+            repo,
+            state='closed',
+            since=since,
+            transform=self._projector)
+
+    def _offline_issues(self, state=None, labels=None, since=None):
+        """Return Issues and Pull Requests from the local store only."""
+        issues = self._store.load_issues(
+            self._repo_full_name,
+            state=state,
+            since=since,
+            transform=self._projector)
+        label_names = [l for l in (labels or '').split(',') if l]
+        if label_names:
+            issues = [
+                issue for issue in issues
+                if all(l in issue['loghub_label_names'] for l in label_names)
+            ]
         return issues
 
+    def _sync_pulls(self):
+        """
+        Return merge metadata of all closed PRs from the local store.
+
+        PRs are listed by most recently updated, so the listing stops at the
+        first page reaching the last sync.
+        """
+        repo = self._repo_full_name
+        last_sync = self._store.last_sync(repo, 'pulls')
+        if last_sync is None:
+            prs = self._get_pages(self.repo.pulls.get, state='closed')
+        else:
+            prs = []
+            page = 1
+            while True:
+                result = self.repo.pulls.get(
+                    state='closed',
+                    sort='updated',
+                    direction='desc',
+                    page=page,
+                    per_page=PER_PAGE)
+                prs += [pr for pr in result if pr['updated_at'] >= last_sync]
+                if len(result) < PER_PAGE or \
+                        result[-1]['updated_at'] < last_sync:
+                    break
+                page += 1
+
+        self._store.save_pulls(repo, prs)
+        updated = [pr['updated_at'] for pr in prs]
+        if updated:
+            self._store.set_last_sync(repo, 'pulls', max(updated))
+
+        return self._store.load_pulls(repo)
+
+    def _search_issues(self, since=None, until=None, milestone=None,
+                       labels=None):
+        """
+        Return Issues and Pull Requests closed between `since` and `until`
+        using the search api, or None if it can't give all of them.
+
+        Only the items closed in the date window are fetched. Windows with
+        more results than the search api can give, or with incomplete
+        results because the search timed out, are split in halves. If
+        results of a day are still incomplete, the REST api must be used.
+        """
+        qualifiers = ['repo:{0}'.format(self._repo_full_name), 'is:closed']
+        if milestone:
+            qualifiers.append('milestone:"{0}"'.format(milestone))
+        for label in (labels or '').split(','):
+            if label:
+                qualifiers.append('label:"{0}"'.format(label))
+
+        since_date = self.str_to_date(since or SEARCH_MIN_DATE)
+        if until:
+            until_date = self.str_to_date(until)
+        else:
+            until_date = utc_now()
+
+        def search(query, page):
+            return self.gh.search.issues.get(
+                q=query, page=page, per_page=PER_PAGE)
+
+        issues = {}
+        windows = [(since_date, until_date)]
+        while windows:
+            start, end = windows.pop()
+            query = ' '.join(qualifiers + [
+                'closed:{0}..{1}'.format(
+                    start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT))
+            ])
+            # Checked once per window, other pages are fetched by workers
+            self._check_rate(SEARCH_RESOURCE)
+            result = search(query, 1)
+
+            # The total is known from the first page, so windows too large
+            # only cost a single request before being split
+            total = result['total_count']
+            if total > SEARCH_MAX_RESULTS and end > start:
+                middle = start + (end - start) // 2
+                windows.append((middle + datetime.timedelta(seconds=1), end))
+                windows.append((start, middle))
+                continue
+
+            results = [result]
+            last_page = (min(total, SEARCH_MAX_RESULTS) + PER_PAGE - 1) \
+                // PER_PAGE
+            if last_page > 1:
+                results += self._map(lambda page: search(query, page),
+                                     range(2, last_page + 1))
+
+            if any(r.get('incomplete_results') for r in results):
+                if end - start <= SEARCH_MIN_WINDOW:
+                    return None
+                middle = start + (end - start) // 2
+                windows.append((middle + datetime.timedelta(seconds=1), end))
+                windows.append((start, middle))
+                continue
+
+            for r in results:
+                for issue in self._projector.project(r['items']):
+                    issues[issue['number']] = issue
+
+        return [issues[number] for number in sorted(issues, reverse=True)]
+
+    def _filter_milestone(self, issues, milestone):
+        """Filter out all issues not in milestone."""
+        for issue in issues:
+            milestone_data = issue.get('milestone', {})
+            if milestone_data:
+                issue_milestone_title = milestone_data.get('title')
+            else:
+                issue_milestone_title = ''
+
+            if issue_milestone_title == milestone:
+                yield issue
+
     def _filter_since(self, issues, since):
         """Filter out all issues before `since` date."""
-        if since:
-            since_date = self.str_to_date(since)
-            for issue in issues[:]:
-                close_date = self.str_to_date(issue['closed_at'])
-                if close_date < since_date and issue in issues:
-                    issues.remove(issue)
-        return issues
+        since_date = self.str_to_date(since)
+        for issue in issues:
+            if closed_date(issue) >= since_date:
+                yield issue
 
     def _filter_until(self, issues, until):
         """Filter out all issues after `until` date."""
-        if until:
-            until_date = self.str_to_date(until)
-            for issue in issues[:]:
-                close_date = self.str_to_date(issue['closed_at'])
-                if close_date > until_date and issue in issues:
-                    issues.remove(issue)
-        return issues
+        until_date = self.str_to_date(until)
+        for issue in issues:
+            if closed_date(issue) <= until_date:
+                yield issue
 
-    def _filter_by_branch(self, issues, issue, branch):
-        """Filter prs by the branch they were merged into."""
+    def _filter_by_branch(self, issue, branch):
+        """Return whether a PR was merged, into `branch` if provided."""
         number = issue['number']
 
-        if not self.is_merged(number) and issue in issues:
-            issues.remove(issue)
+        pr_data = (self._pr_index or {}).get(number)
+        if pr_data is not None:
+            merged = bool(pr_data['merged_at'])
+            return merged and (not branch or pr_data['base_ref'] == branch)
 
-        if branch:
-            # Get PR info and get base branch
-            pr_data = self.pr(number)
-            base_ref = pr_data['base']['ref']
+        if self._offline:
+            # PRs missing from the store can not be checked
+            return False
 
-            if base_ref != branch and issue in issues:
-                issues.remove(issue)
+        if branch:
+            # PR info gives both the merge status and the base branch
+            pr_data = self.repo('pulls')(str(number)).get()
+            return bool(pr_data.get('merged')) and \
+                pr_data['base']['ref'] == branch
 
-        return issues
+        # Only a 404 means not merged, other errors must not drop PRs
+        try:
+            self.repo('pulls')(str(number))('merge').get()
+        except ApiNotFoundError:
+            return False
+        return True
 
     def _filer_closed_prs(self, issues, branch):
         """Filter out closed PRs."""
-        for issue in issues[:]:
-            pr = issue.get('pull_request', '')
-
+        # Checked once here, PRs are resolved in worker threads
+        self._check_rate()
+        issues = list(issues)
+        prs = []
+        for issue in issues:
             # Add label names inside additional key
             issue['loghub_label_names'] = [
                 l['name'] for l in issue.get('labels')
             ]
 
-            if pr:
-                issues = self._filter_by_branch(issues, issue, branch)
+            if issue.get('pull_request', ''):
+                prs.append(issue)
 
-        return issues
+        # The bulk listing takes a request per page of closed PRs instead
+        # of one per PR, and with a store it is synced incrementally
+        if self._store is not None:
+            self.pr_index()
+        elif self._pr_index is None and len(prs) > BULK_PRS_THRESHOLD and \
+                self._closed_prs_pages() < len(prs):
+            self.pr_index()
+
+        # Resolve the merge status of remaining PRs as a concurrent batch
+        merged = self._map(lambda pr: self._filter_by_branch(pr, branch), prs)
+        discarded = set(
+            id(pr) for pr, is_merged in zip(prs, merged) if not is_merged)
+
+        return [issue for issue in issues if id(issue) not in discarded]
+
+    def _closed_prs_pages(self):
+        """
+        Return the number of pages of the bulk listing of closed PRs.
+
+        The `Link` header of the first page of a listing with a single PR
+        per page gives the number of closed PRs.
+        """
+        if self._closed_prs_count is None:
+            self._check_rate()
+            _result, headers = self.repo.pulls.get.with_headers(
+                state='closed', page=1, per_page=1)
+            self._closed_prs_count = self._last_page(headers)
+        return (self._closed_prs_count + PER_PAGE - 1) // PER_PAGE
+
+    @exit_on_rate_limit
+    def pr_index(self):
+        """Return merge metadata of all closed PRs, indexed by number."""
+        if self._pr_index is None and self._offline:
+            self._pr_index = self._store.load_pulls(self._repo_full_name)
+        elif self._pr_index is None and self._store is not None:
+            self._check_rate()
+            self._pr_index = self._sync_pulls()
+        elif self._pr_index is None:
+            self._check_rate()
+            pages = self._get_pages(
+                self.repo.pulls.get,
+                state='closed',
+                transform=lambda prs: [(pr['number'], {
+                    'merged_at': pr.get('merged_at'),
+                    'base_ref': pr['base']['ref'],
+                }) for pr in prs])
+            self._pr_index = dict(pages)
+        return self._pr_index
 
+    @exit_on_rate_limit
     def tags(self):
         """Return all tags."""
-        self._check_rate()
-        return self.repo('git')('refs')('tags').get()
+        if self._tags is None and self._offline:
+            tags = self._check_offline_data(
+                self._store.load_tags(self._repo_full_name), 'tags')
+            self._tags = [
+                JsonObject(
+                    ref='refs/tags/{0}'.format(name),
+                    object=JsonObject(sha=sha))
+                for name, (sha, _date) in sorted(tags.items())
+            ]
+        elif self._tags is None:
+            self._check_rate()
+            self._tags = self._get_pages(self.repo('git')('refs')('tags').get)
+        return self._tags
+
+    def _tag_ref(self, tag_name):
+        """Return the ref of a given tag."""
+        refs = self.tags()
+        ref_name = 'refs/tags/{tag}'.format(tag=tag_name)
+        for ref in refs:
+            if 'object' in ref and ref['ref'] == ref_name:
+                return ref
 
+        tags = [ref['ref'].split('/')[-1] for ref in refs]
+        print("LOGHUB: You didn't pass a valid tag name!")
+        print('LOGHUB: The available tags are: {0}\n'.format(tags))
+        sys.exit(1)
+
+    def _ref_date(self, ref):
+        """
+        Return the date of a tag ref.
+
+        Annotated tags use the tagger date and lightweight tags the date of
+        the tagged commit.
+        """
+        sha = ref['object']['sha']
+        if ref['object'].get('type') == 'commit':
+            commit = self.repo('git')('commits')(sha).get()
+            return commit['committer']['date']
+        return self.repo('git')('tags')(sha).get()['tagger']['date']
+
+    @exit_on_rate_limit
     def tag(self, tag_name):
         """Get tag information."""
         self._check_rate()
-        refs = self.repo('git')('refs')('tags').get()
-        sha = -1
+        ref = self._tag_ref(tag_name)
+        sha = ref['object']['sha']
+        if ref['object'].get('type') == 'commit':
+            # Lightweight tags have no tag object, use the commit date
+            return JsonObject(
+                tag=tag_name,
+                sha=sha,
+                object=ref['object'],
+                tagger=JsonObject(date=self._ref_date(ref)))
 
-        tags = []
-        for ref in refs:
-            ref_name = 'refs/tags/{tag}'.format(tag=tag_name)
-            if 'object' in ref and ref['ref'] == ref_name:
-                sha = ref['object']['sha']
-            tags.append(ref['ref'].split('/')[-1])
+        return self.repo('git')('tags')(sha).get()
 
-        if sha == -1:
-            print("LOGHUB: You didn't pass a valid tag name!")
-            print('LOGHUB: The available tags are: {0}\n'.format(tags))
-            sys.exit(1)
+    @exit_on_rate_limit
+    def tag_date(self, tag_name):
+        """Return the date of a given tag."""
+        if self._tag_dates is not None and tag_name in self._tag_dates:
+            return self._tag_dates[tag_name]
 
-        try:
-            tag = self.repo('git')('tags')(sha).get()
-        except ApiNotFoundError:
-            print("\nLOGHUB: The Git tags API only supports annotated tag "
-                  "objects, not lightweight tags.\n")
-            sys.exit(1)
+        self._check_rate()
+        ref = self._tag_ref(tag_name)
+        if self._store is not None:
+            # Stored tags are resolved incrementally and kept for offline use
+            return self.tag_dates()[tag_name]
+        return self._ref_date(ref)
+
+    def _stored_ref_dates(self, names, refs):
+        """
+        Return the dates of tag `refs`, resolving only the ones not already
+        in the local store for the same tagged object.
+        """
+        if self._store is None:
+            return self._map(self._ref_date, refs)
+
+        stored = self._store.load_tags(self._repo_full_name)
+        shas = [ref['object']['sha'] for ref in refs]
+        missing = [
+            ref for name, sha, ref in zip(names, shas, refs)
+            if stored.get(name, (None, None))[0] != sha
+        ]
+        resolved = dict(
+            (ref['ref'], date)
+            for ref, date in zip(missing, self._map(self._ref_date, missing)))
+
+        dates = []
+        for name, ref in zip(names, refs):
+            if ref['ref'] in resolved:
+                dates.append(resolved[ref['ref']])
+            else:
+                dates.append(stored[name][1])
+        return dates
+
+    @exit_on_rate_limit
+    def tag_dates(self):
+        """
+        Return the dates of all the tags, in chronological order.
+
+        Dates are resolved once per run, concurrently for the REST api and
+        along with the refs for the GraphQL api.
+        """
+        if self._tag_dates is None:
+            if self._offline:
+                tags = self._check_offline_data(
+                    self._store.load_tags(self._repo_full_name), 'tags')
+                names = list(tags)
+                dates = [tags[name][1] for name in names]
+            else:
+                self._check_rate()
+                if self._api == API_GRAPHQL:
+                    nodes = self._graphql_items(graphql.TAGS_QUERY)
+                    names = [node['name'] for node in nodes]
+                    shas = [None] * len(nodes)
+                    dates = [graphql.tag_date(node) for node in nodes]
+                else:
+                    refs = [ref for ref in self.tags() if 'object' in ref]
+                    names = [
+                        ref['ref'].replace('refs/tags/', '') for ref in refs
+                    ]
+                    shas = [ref['object']['sha'] for ref in refs]
+                    dates = self._stored_ref_dates(names, refs)
+
+                if self._store is not None:
+                    self._store.save_tags(self._repo_full_name,
+                                          zip(names, shas, dates))
 
-        return tag
+            tag_dates = [(name, date) for name, date in zip(names, dates)
+                         if date]
+            self._tag_dates = OrderedDict(
+                sorted(tag_dates, key=lambda item: parse_date(item[1])))
+        return self._tag_dates
 
+    @exit_on_rate_limit
     def labels(self):
         """Return labels for the repo."""
         self._check_rate()
         return self.repo.labels.get()
 
+    @exit_on_rate_limit
     def set_labels(self, labels):
         """Return labels for the repo."""
         self._check_rate()
@@ -200,42 +895,56 @@ class GitHubRepo(object):
                 except ApiError:
                     print('\nLabel "{0}" already exists!'.format(new_name))
 
+    @exit_on_rate_limit
     def milestones(self):
         """Return all milestones."""
-        self._check_rate()
-        return self.repo.milestones.get(state='all', direction='desc')
+        return list(self.milestone_index().values())
 
+    @exit_on_rate_limit
+    def milestone_index(self):
+        """Return all milestones indexed by title, fetched once per run."""
+        if self._milestone_index is None:
+            self._check_rate()
+            if self._offline:
+                milestones = self._check_offline_data(
+                    self._store.load_document(self._repo_full_name,
+                                              'milestones'), 'milestones')
+            else:
+                milestones = self._get_pages(
+                    self.repo.milestones.get, state='all', direction='desc')
+            self._milestone_index = OrderedDict(
+                (milestone['title'], milestone) for milestone in milestones)
+            if self._store is not None and not self._offline:
+                self._store.save_document(self._repo_full_name, 'milestones',
+                                          milestones)
+        return self._milestone_index
+
+    @exit_on_rate_limit
     def milestone(self, milestone_title):
         """Return milestone with given title."""
-        self._check_rate()
-        milestones = self.milestones()
-        milestone_number = -1
-
-        milestone_titles = [milestone['title'] for milestone in milestones]
-        for milestone in milestones:
-            if milestone['title'] == milestone_title:
-                milestone_number = milestone['number']
-                break
-
-        if milestone_number == -1:
+        milestone_index = self.milestone_index()
+        if milestone_title not in milestone_index:
             print("LOGHUB: You didn't pass a valid milestone name!")
             print('LOGHUB: The available milestones are: {0}\n'
-                  ''.format(milestone_titles))
+                  ''.format(list(milestone_index)))
             sys.exit(1)
 
-        return milestone
+        return milestone_index[milestone_title]
 
+    @exit_on_rate_limit
     def pr(self, pr_number):
         """Get PR information."""
         self._check_rate()
         return self.repo('pulls')(str(pr_number)).get()
 
+    @exit_on_rate_limit
     def issue(self, issue_number):
         """Get a specific issue number from repo."""
         # /repos/:owner/:repo/issues/:issue_number
         self._check_rate()
         return self.repo.issues(str(issue_number)).get()
 
+    @exit_on_rate_limit
     def issues(self,
                milestone=None,
                state=None,
@@ -249,51 +958,88 @@ class GitHubRepo(object):
                until=None,
                branch=None,
                cache=False,
-               base_issues=None):
-        """Return Issues and Pull Requests."""
+               base_issues=None,
+               any_labels=None):
+        """
+        Return Issues and Pull Requests.
+
+        If given, only items with at least one of `any_labels` are needed,
+        which lets the REST api filter them on the server.
+        """
         self._check_rate()
-        page = 1
 
         if not base_issues:
             milestone_number = None
             if milestone:
                 milestone_data = self.milestone(milestone)
                 milestone_number = milestone_data.get('number')
-            issues = []
-            while True:
-                result = self.repo.issues.get(page=page,
-                                              per_page=100,
-                                              milestone=milestone_number,
-                                              state=state,
-                                              assignee=assignee,
-                                              creator=creator,
-                                              mentioned=mentioned,
-                                              labels=labels,
-                                              sort=sort,
-                                              direction=direction,
-                                              since=since)
-                if len(result) > 0:
-                    issues += result
-                    page = page + 1
-                else:
-                    break
+
+            rest_only = assignee or creator or mentioned or sort or direction
+            if self._offline:
+                issues = self._offline_issues(
+                    state=state, labels=labels, since=since)
+            elif self._api == API_GRAPHQL and not rest_only:
+                issues = self._graphql_issues(
+                    state=state,
+                    labels=labels,
+                    since=since,
+                    milestone=milestone_number)
+            elif self._api == API_SEARCH and state == 'closed' and \
+                    (since or until) and not rest_only:
+                # Searches are only worth it for closing date windows, and
+                # give None if their results are incomplete
+                issues = self._search_issues(
+                    since=since, until=until, milestone=milestone,
+                    labels=labels)
+            elif self._store is not None and state == 'closed' and \
+                    not (rest_only or labels):
+                # Milestones are filtered locally on the synced issues
+                issues = self._sync_issues(since=since)
+            else:
+                issues = None
+
+            if issues is None:
+                issues = self._rest_issues(
+                    any_labels=any_labels,
+                    until=until,
+                    milestone=milestone_number,
+                    state=state,
+                    assignee=assignee,
+                    creator=creator,
+                    mentioned=mentioned,
+                    labels=labels,
+                    sort=sort,
+                    direction=direction,
+                    since=since)
         else:
             issues = base_issues
 
-        # If since was provided, filter the issue
-        issues = self._filter_since(issues, since)
+        # Filters are chained as generators, so issues are traversed once
+        if base_issues and (since or until):
+            # Base issues are reused across calls, so their dates are sorted
+            # once and windows are found by binary search
+            if self._date_index is None or \
+                    self._date_index.issues is not base_issues:
+                self._date_index = ClosedDateIndex(base_issues)
+            issues = self._date_index.window(
+                since=self.str_to_date(since) if since else None,
+                until=self.str_to_date(until) if until else None)
+        else:
+            if since:
+                issues = self._filter_since(issues, since)
 
-        # If until was provided, filter the issue
-        issues = self._filter_until(issues, until)
+            if until:
+                issues = self._filter_until(issues, until)
 
-        # If milestone was provided, filter the issue
-        issues = self._filter_milestone(issues, milestone)
+        if milestone:
+            issues = self._filter_milestone(issues, milestone)
 
         # If it is a pr check if it is merged or closed, removed closed ones
         issues = self._filer_closed_prs(issues, branch)
 
         return issues
 
+    @exit_on_rate_limit
     def is_merged(self, pr):
         """
         Return wether a PR was merged, or if it was closed and discarded.
@@ -304,16 +1050,11 @@ class GitHubRepo(object):
         merged = True
         try:
             self.repo('pulls')(str(pr))('merge').get()
-        except Exception:
+        except ApiNotFoundError:
             merged = False
         return merged
 
     @staticmethod
     def str_to_date(string):
         """Convert ISO date string to datetime object."""
-        parts = string.split('T')
-        date_parts = parts[0]
-        time_parts = parts[1][:-1]
-        year, month, day = [int(i) for i in date_parts.split('-')]
-        hour, minutes, seconds = [int(i) for i in time_parts.split(':')]
-        return datetime.datetime(year, month, day, hour, minutes, seconds)
+        return parse_date(string)
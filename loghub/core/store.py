@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Local SQLite store of Github repository data."""
+
+# Standard library imports
+import json
+import os
+import sqlite3
+
+# Local imports
+from loghub.core.cache import user_cache_path
+from loghub.external.github import _parse_json
+
+# Constants
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS issues (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    state TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS pulls (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    updated_at TEXT,
+    merged_at TEXT,
+    base_ref TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS pr_references (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    repo TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sha TEXT,
+    date TEXT,
+    PRIMARY KEY (repo, name)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    repo TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (repo, kind)
+);
+CREATE TABLE IF NOT EXISTS syncs (
+    repo TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (repo, kind)
+);
+'''
+
+
+def user_store_path():
+    """Return the path of the Loghub local store."""
+    return os.path.join(user_cache_path(), 'store.sqlite')
+
+
+def issue_row(issue):
+    """Return the (number, state, updated_at, data) row of an issue."""
+    return (issue['number'], issue.get('state'), issue.get('updated_at'),
+            json.dumps(issue))
+
+
+class IssueStore(object):
+    """
+    Local SQLite store of issues, PR merge metadata, milestones and tags.
+
+    Data is kept per repository together with the time of the last sync, so
+    later runs only need to fetch the items updated after it.
+    """
+
+    def __init__(self, path=None):
+        """Local SQLite store of Github repository data."""
+        self.path = path or user_store_path()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        """Close the store."""
+        self._connection.close()
+
+    # --- Syncs
+    def last_sync(self, repo, kind):
+        """Return the last sync timestamp of `kind` items of `repo`."""
+        row = self._connection.execute(
+            'SELECT synced_at FROM syncs WHERE repo = ? AND kind = ?',
+            (repo, kind)).fetchone()
+        return row[0] if row else None
+
+    def set_last_sync(self, repo, kind, synced_at):
+        """Set the last sync timestamp of `kind` items of `repo`."""
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)',
+                (repo, kind, synced_at))
+
+    # --- Issues
+    def save_issues(self, repo, issues):
+        """Insert or update issue and pull request payloads."""
+        self.save_issue_rows(repo, [issue_row(issue) for issue in issues])
+
+    def save_issue_rows(self, repo, rows):
+        """Insert or update issue rows given by `issue_row`."""
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?)',
+                [(repo, ) + tuple(row) for row in rows])
+
+    def load_issues(self, repo, state=None, since=None, transform=None):
+        """
+        Return stored issue payloads, most recent first.
+
+        Issues can be filtered by `state` and by being updated at or after
+        `since`, like the Github issues api does. If given, `transform` is
+        applied to each payload as it is loaded.
+        """
+        transform = transform or (lambda issue: issue)
+        query = 'SELECT data FROM issues WHERE repo = ?'
+        args = [repo]
+        if state and state != 'all':
+            query += ' AND state = ?'
+            args.append(state)
+        if since:
+            query += ' AND updated_at >= ?'
+            args.append(since)
+        query += ' ORDER BY number DESC'
+        return [
+            transform(_parse_json(row[0]))
+            for row in self._connection.execute(query, args)
+        ]
+
+    # --- Pull requests
+    def save_pulls(self, repo, pulls):
+        """Insert or update the merge metadata of pull requests."""
+        rows = [(repo, pr['number'], pr.get('updated_at'),
+                 pr.get('merged_at'), pr['base']['ref']) for pr in pulls]
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO pulls VALUES (?, ?, ?, ?, ?)', rows)
+
+    def load_pulls(self, repo):
+        """Return the merge metadata of all stored PRs, indexed by number."""
+        rows = self._connection.execute(
+            'SELECT number, merged_at, base_ref FROM pulls WHERE repo = ?',
+            (repo, ))
+        return dict((number, {
+            'merged_at': merged_at,
+            'base_ref': base_ref,
+        }) for number, merged_at, base_ref in rows)
+
+    # --- Pull request references
+    def save_references(self, repo, references):
+        """
+        Insert or update the issues fixed by PRs, given as a dictionary of
+        PR number to (updated_at, [(issue url, issue number), ...]).
+        """
+        rows = [(repo, number, updated_at, json.dumps(pairs))
+                for number, (updated_at, pairs) in references.items()]
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO pr_references VALUES (?, ?, ?, ?)',
+                rows)
+
+    def load_references(self, repo):
+        """Return the stored issues fixed by PRs, indexed by PR number."""
+        rows = self._connection.execute(
+            'SELECT number, updated_at, data FROM pr_references '
+            'WHERE repo = ?', (repo, ))
+        return dict((number, (updated_at, [
+            tuple(pair) for pair in json.loads(data)
+        ])) for number, updated_at, data in rows)
+
+    # --- Tags
+    def save_tags(self, repo, tags):
+        """Replace the stored tags with (name, sha, date) `tags`."""
+        with self._connection:
+            self._connection.execute('DELETE FROM tags WHERE repo = ?',
+                                     (repo, ))
+            self._connection.executemany(
+                'INSERT INTO tags VALUES (?, ?, ?, ?)',
+                [(repo, name, sha, date) for name, sha, date in tags])
+
+    def load_tags(self, repo):
+        """Return stored tags as a dictionary of name to (sha, date)."""
+        rows = self._connection.execute(
+            'SELECT name, sha, date FROM tags WHERE repo = ?', (repo, ))
+        return dict((name, (sha, date)) for name, sha, date in rows)
+
+    # --- Other documents
+    def save_document(self, repo, kind, data):
+        """Store a json serializable document, like the milestones list."""
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO documents VALUES (?, ?, ?)',
+                (repo, kind, json.dumps(data)))
+
+    def load_document(self, repo, kind):
+        """Return a stored document or None if not available."""
+        row = self._connection.execute(
+            'SELECT data FROM documents WHERE repo = ? AND kind = ?',
+            (repo, kind)).fetchone()
+        return _parse_json(row[0]) if row else None
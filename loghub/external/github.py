@@ -49,9 +49,7 @@ __version__ = '1.1.1'
 
 try:
     # Python 2
-    from urllib2 import build_opener, HTTPSHandler, Request, HTTPError
     from urllib import quote as urlquote
-    from StringIO import StringIO
     from collections import Iterable
 
     def bytes(string, encoding=None):
@@ -59,9 +57,7 @@ try:
 except:
     # Python 3
     from collections.abc import Iterable
-    from urllib.request import build_opener, HTTPSHandler, HTTPError, Request
     from urllib.parse import quote as urlquote
-    from io import StringIO
 
 # Standard library imports
 from datetime import datetime, timedelta, tzinfo
@@ -71,12 +67,43 @@ import hmac
 import json
 import mimetypes
 import os
+import random
 import re
+import threading
 import time
 import urllib
 
+# Third party imports
+from requests.adapters import HTTPAdapter
+import requests
+
+# Use the fastest json decoder available
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    try:
+        from ujson import loads as _json_loads
+    except ImportError:
+        _json_loads = json.loads
+
 TIMEOUT = 60
 
+# Number of keep-alive connections kept open against the API host
+DEFAULT_POOL_SIZE = 10
+
+# Remaining budget under which requests are spread until the limit resets
+DEFAULT_RATE_RESERVE = 50
+
+# Wait used for secondary rate limits without a Retry-After header
+SECONDARY_RATE_WAIT = 60
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Retries of idempotent requests failing with transient errors
+DEFAULT_RETRIES = 3
+DEFAULT_MAX_RETRY_TIME = 120
+RETRY_BACKOFF = 1
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
 _URL = 'https://api.github.com'
 _METHOD_MAP = dict(
     GET=lambda: 'GET',
@@ -126,14 +153,35 @@ def _encode_json(obj):
     return json.dumps(obj, default=_dump_obj)
 
 
+def _wrap_json(value):
+    '''
+    Wrap a decoded json value for attribute access, one level deep.
+
+    Nested values are wrapped lazily when accessed, so no Python code runs
+    per object while decoding.
+    '''
+    value_type = type(value)
+    if value_type is dict:
+        return JsonObject(value)
+    if value_type is list:
+        return JsonList(value)
+    return value
+
+
 def _parse_json(jsonstr):
-    def _obj_hook(pairs):
-        o = JsonObject()
-        for k, v in pairs.items():
-            o[str(k)] = v
-        return o
+    return _wrap_json(_json_loads(jsonstr))
+
 
-    return json.loads(jsonstr, object_hook=_obj_hook)
+def _make_session(pool_size):
+    '''
+    Create a requests session reusing up to `pool_size` keep-alive
+    connections.
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    return session
 
 
 class _Executable(object):
@@ -145,6 +193,9 @@ class _Executable(object):
     def __call__(self, **kw):
         return self._gh._http(self._method, self._path, **kw)
 
+    def with_headers(self, **kw):
+        return self._gh._request(self._method, self._path, **kw)
+
     def __str__(self):
         return '_Executable (%s %s)' % (self._method, self._path)
 
@@ -182,6 +233,79 @@ class _Callable(object):
     __repr__ = __str__
 
 
+def _rate_resource(path):
+    '''
+    Return the rate limit resource used by requests to `path`.
+    '''
+    if path.startswith('/search'):
+        return 'search'
+    if path.startswith('/graphql'):
+        return 'graphql'
+    return 'core'
+
+
+class RateLimiter(object):
+    '''
+    Schedule requests according to the remaining rate limit budget.
+
+    Budgets are tracked per rate limit resource. When `wait` is set and the
+    budget gets under `reserve`, requests are spread evenly until the reset
+    time (a token bucket refilled at remaining/time-to-reset), and an
+    exhausted budget sleeps until the reset instead of failing.
+    '''
+
+    def __init__(self, wait=False, reserve=DEFAULT_RATE_RESERVE):
+        self.wait = wait
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._budgets = {}
+        self._next_time = 0
+
+    def update(self, resource, remaining, reset):
+        with self._lock:
+            self._budgets[resource] = [remaining, reset]
+
+    def budget(self, resource):
+        '''
+        Return the (remaining, reset) budget of `resource`, -1 if unknown.
+        '''
+        with self._lock:
+            return tuple(self._budgets.get(resource, (-1, -1)))
+
+    def acquire(self, resource):
+        '''
+        Block until a request to `resource` can be sent.
+        '''
+        with self._lock:
+            now = time.time()
+            remaining, reset = self._budgets.get(resource, (-1, -1))
+            if remaining == 0 and reset > now:
+                if not self.wait:
+                    raise ApiRateLimitError(reset, resource)
+                # Hold requests of other threads until the reset as well
+                self._next_time = max(self._next_time, reset + 1)
+                self._budgets.pop(resource)
+            delay = max(self._next_time - now, 0)
+            if self.wait and 0 < remaining <= self.reserve and reset > now:
+                interval = float(reset - now) / remaining
+                self._next_time = max(self._next_time, now) + interval
+
+            # Account for requests in flight on other threads
+            if remaining > 0:
+                self._budgets[resource][0] -= 1
+
+        # Sleep without the lock so other threads can take their turn
+        if delay:
+            time.sleep(delay)
+
+    def backoff(self, seconds):
+        '''
+        Hold all requests during `seconds`.
+        '''
+        with self._lock:
+            self._next_time = max(self._next_time, time.time() + seconds)
+
+
 class GitHub(object):
     '''
     GitHub client.
@@ -194,7 +318,13 @@ class GitHub(object):
                  client_id=None,
                  client_secret=None,
                  redirect_uri=None,
-                 scope=None):
+                 scope=None,
+                 pool_size=DEFAULT_POOL_SIZE,
+                 cache=None,
+                 wait_on_rate_limit=False,
+                 timeout=TIMEOUT,
+                 retries=DEFAULT_RETRIES,
+                 max_retry_time=DEFAULT_MAX_RETRY_TIME):
         self.x_ratelimit_remaining = (-1)
         self.x_ratelimit_limit = (-1)
         self.x_ratelimit_reset = (-1)
@@ -211,6 +341,54 @@ class GitHub(object):
         self._client_secret = client_secret
         self._redirect_uri = redirect_uri
         self._scope = scope
+        self._session = _make_session(pool_size)
+        self._rate_limiter = RateLimiter(wait=wait_on_rate_limit)
+        self._timeout = timeout
+        self._retries = retries
+        self._max_retry_time = max_retry_time
+
+        # Run statistics
+        self._stats_lock = threading.Lock()
+        self.stats = dict(
+            requests=0, retries=0, cache_hits=0, rate_limit_waits=0)
+
+        # Responses are cached per credentials, without storing them
+        self._cache = cache
+        self._cache_scope = None
+        if self._authorization:
+            self._cache_scope = hashlib.sha1(
+                self._authorization.encode('utf-8')).hexdigest()
+
+    def _count(self, stat):
+        '''
+        Increase the counter of `stat` in the run statistics.
+        '''
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _retry_delay(self, attempt, start):
+        '''
+        Return the seconds to wait before retry number `attempt`, with
+        exponential backoff and full jitter, or None to stop retrying.
+        '''
+        if attempt >= self._retries:
+            return None
+        delay = random.uniform(0, RETRY_BACKOFF * 2 ** attempt)
+        if time.time() - start + delay > self._max_retry_time:
+            return None
+        return delay
+
+    def close(self):
+        '''
+        Close all the pooled connections.
+        '''
+        self._session.close()
+
+    def rate_limit(self, resource='core'):
+        '''
+        Return the (remaining, reset) rate limit budget of `resource`.
+        '''
+        return self._rate_limiter.budget(resource)
 
     def authorize_url(self, state=None):
         '''
@@ -245,25 +423,28 @@ class GitHub(object):
             kw['redirect_uri'] = self._redirect_uri
         if state:
             kw['state'] = state
-        opener = build_opener(HTTPSHandler)
-        request = Request(
-            'https://github.com/login/oauth/access_token',
-            data=_encode_params(kw))
-        request.get_method = _METHOD_MAP['POST']
-        request.add_header('Accept', 'application/json')
         try:
-            response = opener.open(request, timeout=TIMEOUT)
-            r = _parse_json(response.read())
-            if 'error' in r:
-                raise ApiAuthError(str(r.error))
-            return str(r.access_token)
-        except HTTPError as e:
+            response = self._session.post(
+                'https://github.com/login/oauth/access_token',
+                data=_encode_params(kw),
+                headers={'Accept': 'application/json'},
+                timeout=self._timeout)
+        except requests.RequestException:
+            raise ApiAuthError('HTTPError when get access token')
+        if response.status_code >= 400:
             raise ApiAuthError('HTTPError when get access token')
+        r = _parse_json(response.content.decode('utf-8'))
+        if 'error' in r:
+            raise ApiAuthError(str(r.error))
+        return str(r.access_token)
 
     def __getattr__(self, attr):
         return _Callable(self, '/%s' % attr)
 
     def _http(self, _method, _path, **kw):
+        return self._request(_method, _path, **kw)[0]
+
+    def _request(self, _method, _path, **kw):
         data = None
         params = None
         if _method == 'GET' and kw:
@@ -271,53 +452,132 @@ class GitHub(object):
         if _method in ['POST', 'PATCH', 'PUT']:
             data = bytes(_encode_json(kw), 'utf-8')
         url = '%s%s' % (_URL, _path)
-        opener = build_opener(HTTPSHandler)
-        request = Request(url, data=data)
-        request.get_method = _METHOD_MAP[_method]
+        headers = {}
         if self._authorization:
-            request.add_header('Authorization', self._authorization)
+            headers['Authorization'] = self._authorization
         if _method in ['POST', 'PATCH', 'PUT']:
-            request.add_header('Content-Type',
-                               'application/x-www-form-urlencoded')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        cached = None
+        use_cache = self._cache is not None and _method == 'GET'
+        if use_cache:
+            cached = self._cache.get(url, scope=self._cache_scope)
+            if cached:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
+
+        resource = _rate_resource(_path)
+        start = time.time()
+        attempt = rate_limited = 0
+        while True:
+            self._rate_limiter.acquire(resource)
+            self._count('requests')
+            try:
+                response = self._session.request(
+                    _METHOD_MAP[_method](),
+                    url,
+                    data=data,
+                    headers=headers,
+                    timeout=self._timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response = None
+                error = e
+            else:
+                is_json = self._process_resp(response.headers, resource)
+                wait = self._rate_limit_wait(response)
+                if wait is not None and rate_limited < MAX_RATE_LIMIT_RETRIES:
+                    rate_limited += 1
+                    self._count('rate_limit_waits')
+                    self._rate_limiter.backoff(wait)
+                    continue
+
+            # Only idempotent requests are retried on transient failures
+            transient = (response is None or
+                         response.status_code in RETRY_STATUS_CODES)
+            delay = self._retry_delay(attempt, start)
+            if not transient or _method != 'GET' or delay is None:
+                break
+            attempt += 1
+            self._count('retries')
+            time.sleep(delay)
+
+        if response is None:
+            raise ApiConnectionError(
+                url, JsonObject(method=_method, url=url), error)
+
+        if response.status_code == 304 and cached:
+            self._count('cache_hits')
+            headers = dict(response.headers)
+            if cached.get('link') and 'Link' not in response.headers:
+                headers['Link'] = cached['link']
+            return _parse_json(cached['content']), headers
+
+        content = response.content.decode('utf-8')
+        if response.status_code < 400:
+            if use_cache and is_json:
+                self._cache.set(
+                    url,
+                    content,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                    link=response.headers.get('Link'),
+                    scope=self._cache_scope)
+            if is_json:
+                return _parse_json(content), response.headers
+            return None, response.headers
 
-        class Resp():
-            code = None
+        json = _parse_json(content) if is_json else content
+        req = JsonObject(method=_method, url=url)
+        resp = JsonObject(code=response.status_code, json=json)
+        if resp.code == 404:
+            raise ApiNotFoundError(url, req, resp)
+        raise ApiError(url, req, resp)
 
-        resp = Resp()
-        req = None
+    def _rate_limit_wait(self, response):
+        '''
+        Return the seconds to wait before retrying a rate limited request,
+        or None if the request was not rate limited.
+        '''
+        if response.status_code not in (403, 429):
+            return None
 
-        try:
-            response = opener.open(request, timeout=TIMEOUT)
-            is_json = self._process_resp(response.headers)
-            if is_json:
-                return _parse_json(response.read().decode('utf-8'))
-        except HTTPError as e:
-            is_json = self._process_resp(e.headers)
-            if is_json:
-                json = _parse_json(e.read().decode('utf-8'))
-            else:
-                json = e.read().decode('utf-8')
-            req = JsonObject(method=_method, url=url)
-            resp = JsonObject(code=e.code, json=json)
-        finally:
-            if resp.code == 404:
-                raise ApiNotFoundError(url, req, resp)
-            elif req:
-                raise ApiError(url, req, resp)
-
-    def _process_resp(self, headers):
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining == '0':
+            # Primary rate limit, the limiter waits for the reset if enabled
+            return 0 if self._rate_limiter.wait else None
+
+        if b'secondary rate limit' in response.content.lower():
+            return SECONDARY_RATE_WAIT
+        return None
+
+    def _process_resp(self, headers, resource='core'):
         is_json = False
+        remaining = limit = reset = None
         if headers:
             for k in headers:
                 h = k.lower()
                 if h == 'x-ratelimit-remaining':
-                    self.x_ratelimit_remaining = int(headers[k])
+                    remaining = int(headers[k])
                 elif h == 'x-ratelimit-limit':
-                    self.x_ratelimit_limit = int(headers[k])
+                    limit = int(headers[k])
                 elif h == 'x-ratelimit-reset':
-                    self.x_ratelimit_reset = int(headers[k])
+                    reset = int(headers[k])
                 elif h == 'content-type':
                     is_json = headers[k].startswith('application/json')
+        if remaining is not None and reset is not None:
+            self._rate_limiter.update(resource, remaining, reset)
+            # Legacy attributes only describe the core api budget
+            if resource == 'core':
+                self.x_ratelimit_remaining = remaining
+                self.x_ratelimit_reset = reset
+                if limit is not None:
+                    self.x_ratelimit_limit = limit
         return is_json
 
 
@@ -326,6 +586,18 @@ class JsonObject(dict):
     general json object that can bind any fields but also act as a dict.
     '''
 
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if type(value) in (dict, list):
+            value = _wrap_json(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
     def __getattr__(self, key):
         try:
             return self[key]
@@ -336,6 +608,15 @@ class JsonObject(dict):
         self[attr] = value
 
 
+class JsonList(list):
+    '''
+    json array wrapping its objects for attribute access.
+    '''
+
+    def __init__(self, values=()):
+        super(JsonList, self).__init__(_wrap_json(v) for v in values)
+
+
 class ApiError(Exception):
     def __init__(self, url, request, response):
         super(ApiError, self).__init__(url)
@@ -352,6 +633,20 @@ class ApiNotFoundError(ApiError):
     pass
 
 
+class ApiConnectionError(ApiError):
+    def __init__(self, url, request, error):
+        super(ApiConnectionError, self).__init__(url, request, None)
+        self.error = error
+
+
+class ApiRateLimitError(ApiError):
+    def __init__(self, reset, resource='core'):
+        super(ApiRateLimitError, self).__init__(
+            'API rate limit exceeded', None, None)
+        self.reset = reset
+        self.resource = resource
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Tests configuration."""
+
+# Third party imports
+import pytest
+
+# Local imports
+from loghub.core import formatter
+
+
+# --- Fixtures
+# -----------------------------------------------------------------------------
+@pytest.fixture(autouse=True)
+def user_cache(tmpdir_factory, monkeypatch):
+    """Keep the Loghub cache directory of each test in a temporary one."""
+    path = tmpdir_factory.mktemp('cache')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(path))
+
+    # The template environment is bound to the cache directory it was
+    # created with
+    monkeypatch.setattr(formatter, '_ENVIRONMENT', None)
+    return path
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Tests response cache."""
+
+# Local imports
+from loghub.core.cache import ResponseCache
+
+
+# --- Tests
+# -----------------------------------------------------------------------------
+def test_cache_get_set(tmpdir):
+    cache = ResponseCache(path=str(tmpdir))
+    assert cache.get('url') is None
+
+    cache.set('url', '[]', etag='"abc"')
+    entry = cache.get('url')
+    assert entry['etag'] == '"abc"'
+    assert entry['content'] == '[]'
+
+    # Entries are scoped by credentials
+    assert cache.get('url', scope='other') is None
+
+    # Entries persist across instances
+    assert ResponseCache(path=str(tmpdir)).get('url')['content'] == '[]'
+
+
+def test_cache_needs_validator(tmpdir):
+    cache = ResponseCache(path=str(tmpdir))
+    cache.set('url', '[]')
+    assert cache.get('url') is None
+
+
+def test_cache_refresh(tmpdir):
+    ResponseCache(path=str(tmpdir)).set('url', '[]', etag='"abc"')
+    assert ResponseCache(path=str(tmpdir), refresh=True).get('url') is None
+
+
+def test_cache_lru_eviction(tmpdir):
+    cache = ResponseCache(path=str(tmpdir), max_size=2500)
+    cache.set('first', 'a' * 1000, etag='1')
+    cache.set('second', 'b' * 1000, etag='2')
+
+    # Mark first as recently used so second is evicted instead
+    cache.get('first')
+    cache.set('third', 'c' * 1000, etag='3')
+
+    assert cache.get('first') is not None
+    assert cache.get('second') is None
+    assert cache.get('third') is not None
@@ -8,6 +8,7 @@
 """Tests changelog output."""
 
 # Standard library imports
+from collections import OrderedDict
 import os
 import sys
 import tempfile
@@ -18,6 +19,7 @@ import pytest
 
 # Local imports
 from loghub.cli.main import create_changelog, parse_arguments
+from loghub.core.store import IssueStore
 from loghub.external.github import JsonObject
 
 REPO = 'spyder-ide/loghub'
@@ -402,3 +404,142 @@ def test_argument_parser_valid():
     with patch.object(sys, 'argv', args):
         options = parse_arguments()
     assert options.issue_label_groups == [['type:bug', 'Bugs fixed']]
+
+
+@patch('loghub.core.formatter.GitHubRepo')
+def test_changelog_batch_tags(gh_mock, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    gh_mock.return_value = gh_obj = MagicMock()
+    gh_obj.tag_dates.return_value = OrderedDict([
+        ('v0.1', '2020-01-10T00:00:00Z'),
+        ('v0.2', '2020-02-10T00:00:00Z'),
+    ])
+    issues = [{
+        'loghub_label_names': [],
+        'number': number,
+        'title': 'issue {0}'.format(number),
+        'html_url': 'a_url',
+        'closed_at': closed_at,
+    } for number, closed_at in [(3, '2020-03-01T00:00:00Z'),
+                                (2, '2020-02-10T00:00:00Z'),
+                                (1, '2020-01-01T00:00:00Z')]]
+    gh_obj.issues.return_value = [JsonObject(x) for x in issues]
+
+    log = create_changelog(repo=REPO, batch='tags', use_cache=False)
+
+    # Issues are fetched once and grouped by window locally
+    assert gh_obj.issues.call_count == 1
+    sections = log.split('## Version ')[1:]
+    assert [section.split(' ')[0] for section in sections] == [
+        '<RELEASE_VERSION>', 'v0.2', 'v0.1']
+    for section, number in zip(sections, [3, 2, 1]):
+        assert '[Issue {0}]'.format(number) in section
+        assert section.count('[Issue') == 1
+
+
+@patch('loghub.core.formatter.GitHubRepo')
+def test_changelog_batch_milestones(gh_mock, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    gh_mock.return_value = gh_obj = MagicMock()
+    milestones = {
+        'v0.1': {'title': 'v0.1', 'closed_at': '2020-01-10T00:00:00Z'},
+        'v0.2': {'title': 'v0.2', 'closed_at': '2020-02-10T00:00:00Z'},
+    }
+    gh_obj.milestones.return_value = [milestones['v0.2'], milestones['v0.1']]
+    gh_obj.milestone.side_effect = lambda title: milestones[title]
+    issues = [{
+        'loghub_label_names': [],
+        'number': number,
+        'title': 'issue {0}'.format(number),
+        'html_url': 'a_url',
+        'milestone': milestone and {'title': milestone},
+    } for number, milestone in [(3, None), (2, 'v0.2'), (1, 'v0.1')]]
+    gh_obj.issues.return_value = [JsonObject(x) for x in issues]
+
+    log = create_changelog(repo=REPO, batch='milestones', use_cache=False)
+
+    assert gh_obj.issues.call_count == 1
+    sections = log.split('## Version ')[1:]
+    assert [section.split(' ')[0] for section in sections] == ['0.1', '0.2']
+    assert '[Issue 1]' in sections[0] and '[Issue 2]' in sections[1]
+    assert '[Issue 3]' not in log
+
+
+def test_changelog_offline(tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    store_path = os.path.join(str(tmpdir), 'store.sqlite')
+    store = IssueStore(store_path)
+    store.save_issues(REPO, [{
+        'number': number,
+        'state': 'closed',
+        'title': 'issue {0}'.format(number),
+        'html_url': 'https://github.com/{0}/issues/{1}'.format(REPO, number),
+        'updated_at': '2020-01-01T00:00:00Z',
+        'closed_at': '2020-01-01T00:00:00Z',
+        'labels': [{'name': label}],
+        'milestone': {'number': 1, 'title': milestone},
+    } for number, label, milestone in [(3, 'bug', 'v0.2'),
+                                       (2, 'bug', 'v0.1'),
+                                       (1, 'docs', 'v0.1')]])
+    store.set_last_sync(REPO, 'issues', '2020-01-01T00:00:00Z')
+    store.save_document(REPO, 'milestones', [
+        {'number': 1, 'title': 'v0.1', 'closed_at': '2020-01-10T00:00:00Z'},
+    ])
+    store.close()
+
+    with patch('requests.Session.request') as request:
+        log = create_changelog(
+            repo=REPO,
+            milestone='v0.1',
+            issue_label_groups=[{'label': 'bug', 'name': 'Bugs fixed'}],
+            store_path=store_path,
+            offline=True)
+
+    assert not request.called
+    assert 'Bugs fixed' in log
+    assert '[Issue 2]' in log
+    assert '[Issue 1]' not in log and '[Issue 3]' not in log
+
+
+def test_changelog_offline_no_data(tmpdir):
+    with pytest.raises(SystemExit):
+        create_changelog(
+            repo=REPO,
+            store_path=os.path.join(str(tmpdir), 'store.sqlite'),
+            offline=True)
+
+
+@patch('loghub.core.formatter.GitHubRepo')
+def test_changelog_output_file(gh_mock, tmpdir, capsys):
+    gh_mock.return_value = gh_obj = MagicMock()
+    gh_obj.issues.return_value = [JsonObject({
+        'loghub_label_names': [],
+        'number': 1,
+        'title': 'issue 1',
+        'html_url': 'a_url',
+    })]
+    output_file = tmpdir.join('CHANGELOG.md')
+    output_file.write('previous')
+
+    log = create_changelog(repo=REPO, use_cache=False,
+                           output_file=str(output_file), echo=False)
+
+    assert output_file.read() == log
+    assert '[Issue 1]' in log
+    assert log not in capsys.readouterr().out
+    assert tmpdir.listdir() == [output_file]
+
+    # The changelog can be left out of memory and only written to the file
+    assert create_changelog(repo=REPO, use_cache=False,
+                            output_file=str(output_file), echo=False,
+                            keep_text=False) is None
+    assert output_file.read() == log
+
+    # Failed runs keep the previous output
+    output_file.write('previous')
+    gh_obj.issues.side_effect = RuntimeError
+    with pytest.raises(RuntimeError):
+        create_changelog(repo=REPO, use_cache=False,
+                         output_file=str(output_file))
+    assert output_file.read() == 'previous'
+    assert tmpdir.listdir() == [output_file]
@@ -11,10 +11,19 @@
 import os
 
 # Third party imports
+from jinja2 import Template
+from mock import patch
 import pytest
 
 # Local imports
-from loghub.core.formatter import filter_issues_fixed_by_prs
+from loghub.core.formatter import (filter_issue_label_groups,
+                                   filter_issues_by_regex,
+                                   filter_issues_fixed_by_prs,
+                                   filter_prs_by_regex, partition_issues,
+                                   render_changelog, template_environment)
+from loghub.core.references import (ReferenceIndex, find_references,
+                                    reference_url)
+from loghub.core.store import IssueStore
 from loghub.tests.utils import Issue
 
 
@@ -86,3 +95,138 @@ def test_filter_issues_fixed_by_prs_show():
     )
     assert all(bool(issue['loghub_related_pulls']) for issue in new_issues)
     assert all(bool(pr['loghub_related_issues']) for pr in new_prs)
+
+
+def test_find_references():
+    body = ('Fixes #34, closes spyder-ide/loghub#45\n'
+            'resolves https://github.com/foo/bar/issues/12\n'
+            'fix the issue in #7\n'
+            'nothing to see here')
+    assert find_references(body) == [
+        ('', '34'),
+        ('spyder-ide/loghub', '45'),
+        ('https://github.com/foo/bar/issues', '12'),
+        ('the issue in ', '7'),
+    ]
+
+    repo_url = 'https://github.com/foo/bar/issues/'
+    urls = [reference_url(repo, number, repo_url)
+            for repo, number in find_references(body)]
+    assert urls == [
+        'https://github.com/foo/bar/issues/34',
+        'https://github.com/spyder-ide/loghub/issues/45',
+        'https://github.com/foo/bar/issues/12',
+        None,
+    ]
+
+
+def test_find_references_long_body():
+    # Keywords without references used to backtrack over the whole line
+    body = 'fix ' * 100000 + '\n' + 'Fixes #1'
+    assert find_references(body) == [('', '1')]
+
+
+def test_filter_issues_fixed_by_several_prs():
+    issues = [Issue(number=34)]
+    prs = [
+        Issue(body='Fixes #34', is_pr=True, number=45),
+        Issue(body='Closes #34', is_pr=True, number=46),
+    ]
+
+    new_issues, _new_prs = filter_issues_fixed_by_prs(
+        issues, prs, show_related_prs=True, show_related_issues=True
+    )
+    related = new_issues[0]['loghub_related_pulls']
+    assert [pr['text'] for pr in related] == [46, 45]
+
+
+def test_reference_index(tmpdir):
+    path = os.path.join(str(tmpdir), 'store.sqlite')
+    pr = Issue(body='Fixes #34', is_pr=True, number=45)
+    pr['updated_at'] = '2020-01-01T00:00:00Z'
+
+    index = ReferenceIndex(IssueStore(path), 'foo/bar')
+    assert index.references(pr) == [
+        ('https://github.com/foo/bar/issues/34', '34')]
+    index.save()
+
+    # Stored references are used while the PR is not updated
+    index = ReferenceIndex(IssueStore(path), 'foo/bar')
+    with patch('loghub.core.references.pr_references') as pr_references:
+        issues = [Issue(number=34)]
+        filter_issues_fixed_by_prs(issues, [pr], True, True,
+                                   reference_index=index)
+        assert not pr_references.called
+        assert issues[0]['loghub_related_pulls'][0]['text'] == 45
+
+        pr['updated_at'] = '2020-02-01T00:00:00Z'
+        index.references(pr)
+        assert pr_references.called
+
+
+def test_partition_issues():
+    items = []
+    for number, labels, is_pr in [(1, ['bug'], False),
+                                  (2, ['bug', 'docs'], False),
+                                  (3, ['enhancement'], False),
+                                  (4, ['bug'], True),
+                                  (5, ['docs', 'bug'], True),
+                                  (6, [], True)]:
+        item = Issue(number=number, is_pr=is_pr)
+        item['loghub_label_names'] = labels
+        items.append(item)
+
+    issue_groups = [{'label': 'docs', 'name': 'Docs'},
+                    {'label': 'bug', 'name': 'Bugs'}]
+    pr_groups = [{'label': 'bug', 'name': 'Fixes'}]
+    for issue_regex, pr_regex in [('', ''), ('bug', 'docs'), ('nope', '')]:
+        for groups in [(issue_groups, pr_groups), ([], [])]:
+            expected_issues, expected_grouped_issues = \
+                filter_issue_label_groups(
+                    filter_issues_by_regex(items, issue_regex), groups[0])
+            expected_prs, expected_grouped_prs = filter_issue_label_groups(
+                filter_prs_by_regex(items, pr_regex), groups[1])
+
+            assert partition_issues(items, issue_regex, pr_regex,
+                                    *groups) == (expected_issues,
+                                                 expected_grouped_issues,
+                                                 expected_prs,
+                                                 expected_grouped_prs)
+
+
+def test_template_environment(tmpdir, user_cache):
+    path = tmpdir.join('template.txt')
+    path.write('{{ version }} {% for i in issues %}{{ i }}{% endfor %}\n')
+    env = template_environment()
+    assert template_environment() is env
+
+    log = render_changelog('foo/bar', [1, 2], [], version='1.0',
+                           template_file=str(path))
+    assert log == Template(path.read()).render(issues=[1, 2], version='1.0')
+
+    # Bytecode is cached in the user cache directory
+    assert user_cache.join('loghub', 'templates').listdir()
+
+    # Compiled templates are reused until the file is modified
+    template = env.get_template(str(path))
+    assert env.get_template(str(path)) is template
+
+    path.write('changed {{ version }}')
+    mtime = os.path.getmtime(str(path)) + 10
+    os.utime(str(path), (mtime, mtime))
+    log = render_changelog('foo/bar', [], [], version='1.0',
+                           template_file=str(path))
+    assert log == 'changed 1.0'
+
+
+def test_template_environment_no_cache(tmpdir, monkeypatch):
+    # Cache directory can't be created
+    path = tmpdir.join('cache')
+    path.write('')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(path))
+
+    template = tmpdir.join('template.txt')
+    template.write('{{ version }}')
+    assert template_environment().bytecode_cache is None
+    assert render_changelog('foo/bar', [], [], version='1.0',
+                            template_file=str(template)) == '1.0'
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Tests github api client."""
+
+# Standard library imports
+import time
+
+# Third party imports
+from mock import patch
+import pytest
+import requests
+
+# Local imports
+from loghub.core.cache import ResponseCache
+from loghub.external.github import (ApiConnectionError, ApiError,
+                                    ApiNotFoundError, ApiRateLimitError,
+                                    GitHub, JsonObject, _parse_json)
+from loghub.tests.utils import make_response
+
+
+# --- Tests
+# -----------------------------------------------------------------------------
+def test_session_pool_size():
+    gh = GitHub(pool_size=3)
+    adapter = gh._session.get_adapter('https://api.github.com')
+    assert adapter._pool_maxsize == 3
+
+
+def test_http_reuses_session():
+    gh = GitHub(access_token='token')
+    response = make_response(data={'login': 'foo'})
+    with patch.object(gh._session, 'request', return_value=response) as req:
+        assert gh.users('foo').get().login == 'foo'
+        assert gh.users('foo').get().login == 'foo'
+
+    assert req.call_count == 2
+    headers = req.call_args[1]['headers']
+    assert headers['Authorization'] == 'token token'
+
+
+def test_http_errors():
+    gh = GitHub()
+    with patch.object(gh._session, 'request',
+                      return_value=make_response(404, {'message': ''})):
+        with pytest.raises(ApiNotFoundError):
+            gh.users('foo').get()
+
+    with patch.object(gh._session, 'request',
+                      return_value=make_response(500, {'message': ''})):
+        with pytest.raises(ApiError):
+            gh.users('foo').get()
+
+
+def test_http_conditional_request(tmpdir):
+    gh = GitHub(cache=ResponseCache(path=str(tmpdir)))
+    response = make_response(data=[{'number': 1}], headers={'ETag': '"abc"'})
+    with patch.object(gh._session, 'request', return_value=response):
+        gh.repos('foo')('bar').issues.get()
+
+    not_modified = make_response(304)
+    with patch.object(gh._session, 'request',
+                      return_value=not_modified) as req:
+        issues = gh.repos('foo')('bar').issues.get()
+
+    assert issues[0].number == 1
+    assert req.call_args[1]['headers']['If-None-Match'] == '"abc"'
+
+
+def test_rate_limit_exceeded():
+    gh = GitHub()
+    reset = int(time.time()) + 60
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)}
+    with patch.object(gh._session, 'request',
+                      return_value=make_response(data={}, headers=headers)):
+        gh.users('foo').get()
+        with pytest.raises(ApiRateLimitError):
+            gh.users('foo').get()
+
+
+def test_rate_limit_wait_for_reset():
+    gh = GitHub(wait_on_rate_limit=True)
+    reset = int(time.time()) + 60
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)}
+    response = make_response(data={}, headers=headers)
+    with patch.object(gh._session, 'request', return_value=response), \
+            patch('loghub.external.github.time.sleep') as sleep:
+        gh.users('foo').get()
+        gh.users('foo').get()
+
+    assert sleep.call_args[0][0] >= 60
+
+
+def test_rate_limit_throttle():
+    gh = GitHub(wait_on_rate_limit=True)
+    reset = int(time.time()) + 100
+    headers = {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(reset)}
+    response = make_response(data={}, headers=headers)
+    with patch.object(gh._session, 'request', return_value=response), \
+            patch('loghub.external.github.time.sleep') as sleep:
+        for _ in range(3):
+            gh.users('foo').get()
+
+    # Requests are spread over the time left until the reset
+    assert 5 < sleep.call_args[0][0] <= 10
+
+
+def test_rate_limit_resources():
+    gh = GitHub()
+    reset = int(time.time()) + 60
+    headers = {'X-RateLimit-Remaining': '5', 'X-RateLimit-Limit': '5000',
+               'X-RateLimit-Reset': str(reset)}
+    with patch.object(gh._session, 'request',
+                      return_value=make_response(data={}, headers=headers)):
+        gh.users('foo').get()
+        assert gh.x_ratelimit_remaining == 5
+        assert gh.x_ratelimit_limit == 5000
+
+    # Search budget does not overwrite the core one
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Limit': '30',
+               'X-RateLimit-Reset': str(reset)}
+    with patch.object(gh._session, 'request',
+                      return_value=make_response(data={}, headers=headers)):
+        gh.search.issues.get(q='repo:foo/bar')
+
+    assert gh.x_ratelimit_remaining == 5
+    assert gh.x_ratelimit_limit == 5000
+
+
+def test_rate_limit_sleeps_without_lock():
+    gh = GitHub(wait_on_rate_limit=True)
+    limiter = gh._rate_limiter
+    limiter.update('core', 0, int(time.time()) + 60)
+    locked = []
+    with patch('loghub.external.github.time.sleep',
+               side_effect=lambda delay: locked.append(limiter._lock.locked())):
+        limiter.acquire('core')
+
+    assert locked == [False]
+
+    # Other threads are held until the reset too
+    assert limiter._next_time > time.time() + 59
+
+
+def test_secondary_rate_limit_retry_after():
+    gh = GitHub()
+    limited = make_response(403, {'message': 'secondary rate limit'},
+                            headers={'Retry-After': '30'})
+    responses = [limited, make_response(data={'login': 'foo'})]
+    with patch.object(gh._session, 'request', side_effect=responses), \
+            patch('loghub.external.github.time.sleep') as sleep:
+        assert gh.users('foo').get().login == 'foo'
+
+    assert 29 < sleep.call_args[0][0] <= 30
+
+
+def test_retry_transient_errors():
+    gh = GitHub(retries=2)
+    responses = [
+        requests.ConnectionError(),
+        make_response(502),
+        make_response(data={'login': 'foo'}),
+    ]
+    with patch.object(gh._session, 'request', side_effect=responses), \
+            patch('loghub.external.github.time.sleep'):
+        assert gh.users('foo').get().login == 'foo'
+
+    assert gh.stats['requests'] == 3
+    assert gh.stats['retries'] == 2
+
+
+def test_retry_gives_up():
+    gh = GitHub(retries=1)
+    with patch.object(gh._session, 'request',
+                      side_effect=requests.Timeout()), \
+            patch('loghub.external.github.time.sleep'):
+        with pytest.raises(ApiConnectionError):
+            gh.users('foo').get()
+
+    assert gh.stats['retries'] == 1
+
+    # Non idempotent requests are not retried
+    with patch.object(gh._session, 'request',
+                      return_value=make_response(503)) as req:
+        with pytest.raises(ApiError):
+            gh.repos('foo')('bar').issues.post(title='title')
+
+    assert req.call_count == 1
+
+
+def test_parse_json_lazy_wrapping():
+    data = _parse_json('[{"user": {"login": "foo"}, '
+                       '"labels": [{"name": "bug"}]}]')
+    issue = data[0]
+
+    assert isinstance(issue, JsonObject)
+    assert issue.user.login == 'foo'
+    assert issue['labels'][0].name == 'bug'
+    assert issue.get('labels')[0]['name'] == 'bug'
+    assert issue.get('missing', 'default') == 'default'
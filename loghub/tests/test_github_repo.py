@@ -8,14 +8,23 @@
 """Tests github repo."""
 
 # Standard library imports
+import json
 import os
+import re
+import time
 
 # Third party imports
+from mock import patch
+from requests.utils import unquote
 import pytest
 
 # Local imports
-from loghub.core.repo import GitHubRepo
+from loghub.core import graphql
+from loghub.core.models import Issue
+from loghub.core.repo import API_GRAPHQL, API_SEARCH, GitHubRepo
+from loghub.core.store import IssueStore
 from loghub.external.github import ApiError
+from loghub.tests.utils import make_response
 
 REPO = 'spyder-ide/loghub'
 TEST_TOKEN = os.environ.get('TEST_TOKEN', '').replace('x', '')
@@ -33,6 +42,17 @@ def gh_repo():
     return GitHubRepo(token=TEST_TOKEN, repo=REPO)
 
 
+@pytest.fixture
+def unchecked_repo():
+    with patch.object(GitHubRepo, '_check_user'), \
+            patch.object(GitHubRepo, '_check_repo_name'):
+        yield GitHubRepo(repo=REPO)
+
+
+def page_number(url):
+    return int(re.search(r'[?&]page=(\d+)', url).group(1))
+
+
 # --- Tests
 # -----------------------------------------------------------------------------
 @pytest.mark.skipif(NOT_ON_CI, reason='test on ci server only')
@@ -136,3 +156,490 @@ def test_dates():
     assert date.hour == 8
     assert date.minute == 8
     assert date.second == 8
+
+
+def test_issues_link_pagination(unchecked_repo):
+    link = ('<https://api.github.com/repos/{0}/issues?page=2&per_page=100>; '
+            'rel="next", <https://api.github.com/repos/{0}/issues?page=4'
+            '&per_page=100>; rel="last"'.format(REPO))
+    urls = []
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        page = page_number(url)
+        headers = {'Link': link} if page == 1 else {}
+        data = [{'number': page, 'labels': []}]
+        return make_response(data=data, headers=headers)
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        issues = unchecked_repo.issues(state='closed')
+
+    assert [issue['number'] for issue in issues] == [1, 2, 3, 4]
+    assert len(urls) == 4
+
+
+def test_filter_closed_prs(unchecked_repo):
+    issues = [
+        {'number': 3, 'labels': [{'name': 'bug'}]},
+        {'number': 2, 'labels': [], 'pull_request': {'url': ''}},
+        {'number': 1, 'labels': [], 'pull_request': {'url': ''}},
+    ]
+
+    def request(method, url, **kwargs):
+        number = int(url.split('/pulls/')[1].split('/')[0])
+        if url.endswith('/merge'):
+            return make_response(204 if number == 1 else 404)
+        data = {'merged': number == 1, 'base': {'ref': 'master'}}
+        return make_response(data=data)
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        merged = unchecked_repo._filer_closed_prs(issues[:], branch=None)
+        assert [i['number'] for i in merged] == [3, 1]
+        assert merged[0]['loghub_label_names'] == ['bug']
+
+        merged = unchecked_repo._filer_closed_prs(issues[:], branch='master')
+        assert [i['number'] for i in merged] == [3, 1]
+
+        merged = unchecked_repo._filer_closed_prs(issues[:], branch='3.x')
+        assert [i['number'] for i in merged] == [3]
+
+
+def test_filter_closed_prs_bulk(unchecked_repo):
+    issues = [{'number': n, 'labels': [], 'pull_request': {'url': ''}}
+              for n in range(150, 0, -1)]
+    urls = []
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        data = [{
+            'number': n,
+            'merged_at': '2020-01-01T00:00:00Z' if n % 2 else None,
+            'base': {'ref': 'master' if n < 100 else '3.x'},
+        } for n in range(1, 151)]
+        return make_response(data=data)
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        merged = unchecked_repo._filer_closed_prs(issues[:], branch='master')
+
+    # The size of the listing is checked with a single PR per page
+    assert len(urls) == 2
+    assert '/pulls?' in urls[0]
+    assert re.search(r'[?&]per_page=1(&|$)', urls[0])
+    assert '/pulls?' in urls[1] and 'per_page=100' in urls[1]
+    assert [i['number'] for i in merged] == list(range(99, 0, -2))
+
+
+def test_filter_closed_prs_bulk_too_long(unchecked_repo):
+    issues = [{'number': n, 'labels': [], 'pull_request': {'url': ''}}
+              for n in (3, 2, 1)]
+    urls = []
+    link = ('<https://api.github.com/repos/{0}/pulls?state=closed&page=1000'
+            '&per_page=1>; rel="last"'.format(REPO))
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        if '/pulls?' in url:
+            return make_response(data=[], headers={'Link': link})
+        return make_response(204)
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        merged = unchecked_repo._filer_closed_prs(issues[:], branch=None)
+
+    # 10 pages of closed PRs take more requests than the 3 PRs
+    assert len(urls) == 4
+    assert sum('/merge' in url for url in urls) == 3
+    assert [i['number'] for i in merged] == [3, 2, 1]
+
+
+def graphql_node(number, pr=False, merged=False, labels=()):
+    node = {
+        'number': number,
+        'title': 'title {0}'.format(number),
+        'url': 'https://github.com/{0}/issues/{1}'.format(REPO, number),
+        'body': '',
+        'state': 'MERGED' if merged else 'CLOSED',
+        'createdAt': '2020-01-01T00:00:00Z',
+        'updatedAt': '2020-01-02T00:00:00Z',
+        'closedAt': '2020-01-02T00:00:00Z',
+        'author': None,
+        'labels': {'nodes': [{'name': label} for label in labels]},
+        'milestone': {'number': 1, 'title': 'v1.0', 'closedAt': None},
+    }
+    if pr:
+        node['merged'] = merged
+        node['mergedAt'] = '2020-01-02T00:00:00Z' if merged else None
+        node['baseRefName'] = 'master'
+    return node
+
+
+def test_issues_graphql(unchecked_repo):
+    gh_repo = unchecked_repo
+    gh_repo._api = API_GRAPHQL
+
+    def request(method, url, data=None, **kwargs):
+        assert url.endswith('/graphql')
+        body = json.loads(data.decode('utf-8'))
+        cursor = body['variables']['cursor']
+        if 'pullRequests' in body['query']:
+            nodes = [graphql_node(4, pr=True, merged=True, labels=['bug']),
+                     graphql_node(3, pr=True)]
+            page_info = {'hasNextPage': False, 'endCursor': None}
+        elif cursor is None:
+            nodes = [graphql_node(2, labels=['bug'])]
+            page_info = {'hasNextPage': True, 'endCursor': 'next'}
+        else:
+            nodes = [graphql_node(1)]
+            page_info = {'hasNextPage': False, 'endCursor': None}
+        items = {'nodes': nodes, 'pageInfo': page_info}
+        return make_response(
+            data={'data': {'repository': {'items': items}}})
+
+    with patch.object(gh_repo.gh._session, 'request', new=request):
+        issues = gh_repo.issues(state='closed', branch='master')
+
+    assert [issue['number'] for issue in issues] == [4, 2, 1]
+    assert all(isinstance(issue, Issue) for issue in issues)
+    assert issues[0]['pull_request']
+    assert issues[0]['loghub_label_names'] == ['bug']
+    assert issues[0]['user']['login'] == 'ghost'
+    assert issues[1]['milestone']['title'] == 'v1.0'
+
+
+def test_issues_graphql_milestone(unchecked_repo):
+    gh_repo = unchecked_repo
+    gh_repo._api = API_GRAPHQL
+    bodies = []
+
+    def request(method, url, data=None, **kwargs):
+        body = json.loads(data.decode('utf-8'))
+        bodies.append(body)
+        if 'pullRequests' in body['query']:
+            nodes = [graphql_node(4, pr=True, merged=True)]
+            nodes[0]['updatedAt'] = nodes[0]['closedAt'] = \
+                '2020-01-10T00:00:00Z'
+            nodes += [graphql_node(3, pr=True, merged=True)]
+            page_info = {'hasNextPage': True, 'endCursor': 'next'}
+            items = {'nodes': nodes, 'pageInfo': page_info}
+            repository = {'milestone': {'items': items}}
+        else:
+            nodes = [graphql_node(2)]
+            page_info = {'hasNextPage': False, 'endCursor': None}
+            repository = {'items': {'nodes': nodes, 'pageInfo': page_info}}
+        return make_response(data={'data': {'repository': repository}})
+
+    with patch.object(gh_repo.gh._session, 'request', new=request), \
+            patch.object(gh_repo, 'milestone',
+                         return_value={'number': 1, 'title': 'v1.0'}):
+        issues = gh_repo.issues(
+            milestone='v1.0', state='closed', since='2020-01-05T00:00:00Z')
+
+    # Issues are filtered on the server and PRs listed from the milestone
+    issue_body, pr_body = sorted(
+        bodies, key=lambda body: 'pullRequests' in body['query'])
+    assert issue_body['variables']['milestone'] == '1'
+    assert issue_body['variables']['since'] == '2020-01-05T00:00:00Z'
+    assert issue_body['variables']['body'] is False
+    assert 'milestone(number: $milestone)' in pr_body['query']
+    assert pr_body['variables']['milestone'] == 1
+
+    # PR pages stop at the ones updated before `since`
+    assert len(bodies) == 2
+    assert [issue['number'] for issue in issues] == [4]
+
+
+def test_issues_filters(unchecked_repo):
+    base_issues = [{
+        'number': n,
+        'labels': [],
+        'closed_at': '2020-01-{0:02d}T00:00:00Z'.format(n),
+        'milestone': {'title': 'v1.0' if n % 2 else 'v2.0'},
+    } for n in range(10, 0, -1)]
+    issues = unchecked_repo.issues(
+        milestone='v1.0',
+        since='2020-01-03T00:00:00Z',
+        until='2020-01-07T00:00:00Z',
+        base_issues=base_issues)
+
+    assert [issue['number'] for issue in issues] == [7, 5, 3]
+    assert len(base_issues) == 10
+
+
+def test_milestone_index(unchecked_repo):
+    urls = []
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        data = [{'number': n, 'title': 'v{0}'.format(n)} for n in (2, 1)]
+        return make_response(data=data)
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        assert unchecked_repo.milestone('v1')['number'] == 1
+        assert unchecked_repo.milestone('v2')['number'] == 2
+        assert [m['title'] for m in unchecked_repo.milestones()] == ['v2', 'v1']
+        with pytest.raises(SystemExit):
+            unchecked_repo.milestone('v3')
+
+    assert len(urls) == 1
+
+
+def test_tag_dates(unchecked_repo):
+    refs = [
+        {'ref': 'refs/tags/v0.2',
+         'object': {'sha': 'c2', 'type': 'commit'}},
+        {'ref': 'refs/tags/v0.1',
+         'object': {'sha': 't1', 'type': 'tag'}},
+    ]
+
+    def request(method, url, **kwargs):
+        if '/git/refs/tags' in url:
+            return make_response(data=refs)
+        elif '/git/tags/t1' in url:
+            return make_response(
+                data={'tagger': {'date': '2020-01-01T00:00:00Z'}})
+        elif '/git/commits/c2' in url:
+            return make_response(
+                data={'committer': {'date': '2020-02-01T00:00:00Z'}})
+        return make_response(404, {})
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        # Lightweight tags use the date of their commit
+        assert unchecked_repo.tag_date('v0.2') == '2020-02-01T00:00:00Z'
+        assert unchecked_repo.tag('v0.2')['tagger']['date'] == \
+            '2020-02-01T00:00:00Z'
+        assert list(unchecked_repo.tag_dates().items()) == [
+            ('v0.1', '2020-01-01T00:00:00Z'),
+            ('v0.2', '2020-02-01T00:00:00Z'),
+        ]
+        with pytest.raises(SystemExit):
+            unchecked_repo.tag_date('v0.3')
+
+
+def test_graphql_tag_date():
+    annotated = {'target': {'tagger': {'date': '2017-02-01T10:48:21-05:00'}}}
+    lightweight = {'target': {'committedDate': '2017-02-01T15:48:21Z'}}
+    assert graphql.tag_date(annotated) == '2017-02-01T15:48:21Z'
+    assert graphql.tag_date(lightweight) == '2017-02-01T15:48:21Z'
+
+
+def test_issues_store_sync(unchecked_repo, tmpdir):
+    store = IssueStore(os.path.join(str(tmpdir), 'store.sqlite'))
+    responses = {
+        'state=closed': [
+            {'number': 2, 'state': 'closed', 'labels': [],
+             'closed_at': '2020-01-02T00:00:00Z',
+             'updated_at': '2020-01-02T00:00:00Z'},
+            {'number': 1, 'state': 'closed', 'labels': [],
+             'closed_at': '2020-01-01T00:00:00Z',
+             'updated_at': '2020-01-01T00:00:00Z'},
+        ],
+        'state=all': [
+            {'number': 3, 'state': 'closed', 'labels': [],
+             'closed_at': '2020-01-03T00:00:00Z',
+             'updated_at': '2020-01-03T00:00:00Z'},
+            {'number': 2, 'state': 'open', 'labels': [],
+             'closed_at': None,
+             'updated_at': '2020-01-03T00:00:00Z'},
+        ],
+    }
+    urls = []
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        for key, data in responses.items():
+            if key in url:
+                return make_response(data=data)
+
+    gh = unchecked_repo
+    gh._store = store
+    with patch.object(gh.gh._session, 'request', new=request):
+        issues = gh._sync_issues()
+        assert [issue['number'] for issue in issues] == [2, 1]
+        assert all(isinstance(issue, Issue) for issue in issues)
+
+        # Only items updated since the last sync are fetched again
+        issues = gh._sync_issues()
+
+    # Full payloads are stored while fetched pages are projected
+    assert store.load_issues(REPO)[0] == responses['state=all'][0]
+    assert all(isinstance(issue, Issue) for issue in issues)
+    assert 'since=' not in urls[0]
+    assert 'since=2020-01-02T00%3A00%3A00Z' in urls[1]
+    assert [issue['number'] for issue in issues] == [3, 1]
+
+
+def test_issues_query_planner(unchecked_repo):
+    issues = [{
+        'number': number,
+        'labels': [{'name': label}],
+        'created_at': created_at,
+        'closed_at': '2020-02-01T00:00:00Z',
+    } for number, label, created_at in [(1, 'bug', '2020-01-01T00:00:00Z'),
+                                        (2, 'docs', '2020-01-02T00:00:00Z'),
+                                        (3, 'bug', '2020-03-01T00:00:00Z')]]
+    urls = []
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        label = re.search(r'labels=(\w+)', url).group(1)
+        data = [issue for issue in issues
+                if issue['labels'][0]['name'] == label]
+        return make_response(data=data)
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        result = unchecked_repo.issues(
+            state='closed',
+            until='2020-02-15T00:00:00Z',
+            any_labels=['bug', 'docs'])
+
+    # A query per label, sorted by creation and stopping after `until`
+    assert len(urls) == 2
+    assert all('sort=created' in url and 'direction=asc' in url
+               for url in urls)
+    assert [issue['number'] for issue in result] == [2, 1]
+
+
+def test_issues_search(unchecked_repo):
+    unchecked_repo._api = API_SEARCH
+    queries = []
+
+    def request(method, url, **kwargs):
+        assert '/search/issues?' in url
+        query = unquote(re.search(r'[?&]q=([^&]*)', url).group(1))
+        queries.append(query)
+        window = re.search(r'closed:(\S+)\.\.(\S+)', query).groups()
+        if window == ('2020-01-01T00:00:00Z', '2020-01-31T00:00:00Z'):
+            # Too many results for a single search
+            return make_response(data={'total_count': 1500, 'items': []})
+
+        page = page_number(url)
+        number = 2 * page if window[0] == '2020-01-01T00:00:00Z' else 100
+        items = [{
+            'number': number + offset,
+            'labels': [],
+            'closed_at': '2020-01-10T00:00:00Z',
+        } for offset in (0, 1)]
+        return make_response(data={'total_count': 150, 'items': items})
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        issues = unchecked_repo.issues(
+            state='closed',
+            milestone=None,
+            since='2020-01-01T00:00:00Z',
+            until='2020-01-31T00:00:00Z')
+
+    assert 'repo:{0} is:closed'.format(REPO) in queries[0]
+    windows = [re.search(r'closed:(\S+)', query).group(1)
+               for query in queries]
+    assert windows == [
+        '2020-01-01T00:00:00Z..2020-01-31T00:00:00Z',
+        '2020-01-01T00:00:00Z..2020-01-16T00:00:00Z',
+        '2020-01-01T00:00:00Z..2020-01-16T00:00:00Z',
+        '2020-01-16T00:00:01Z..2020-01-31T00:00:00Z',
+        '2020-01-16T00:00:01Z..2020-01-31T00:00:00Z',
+    ]
+    assert [issue['number'] for issue in issues] == [101, 100, 5, 4, 3, 2]
+
+
+def test_issues_search_incomplete(unchecked_repo):
+    unchecked_repo._api = API_SEARCH
+    queries = []
+    rest_urls = []
+
+    def request(method, url, **kwargs):
+        if '/search/issues?' not in url:
+            rest_urls.append(url)
+            return make_response(data=[{
+                'number': 1,
+                'labels': [],
+                'created_at': '2020-01-01T00:00:00Z',
+                'closed_at': '2020-01-02T00:00:00Z',
+            }])
+
+        query = unquote(re.search(r'[?&]q=([^&]*)', url).group(1))
+        queries.append(query)
+        return make_response(data={
+            'total_count': 1,
+            'incomplete_results': True,
+            'items': [],
+        })
+
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        issues = unchecked_repo.issues(
+            state='closed',
+            milestone=None,
+            since='2020-01-01T00:00:00Z',
+            until='2020-01-03T00:00:00Z')
+
+    # Windows are split down to a day, then the REST api is used instead
+    windows = [re.search(r'closed:(\S+)', query).group(1)
+               for query in queries]
+    assert windows == [
+        '2020-01-01T00:00:00Z..2020-01-03T00:00:00Z',
+        '2020-01-01T00:00:00Z..2020-01-02T00:00:00Z',
+    ]
+    assert len(rest_urls) == 1
+    assert [issue['number'] for issue in issues] == [1]
+
+
+def test_issues_search_rate_limit(unchecked_repo):
+    unchecked_repo._api = API_SEARCH
+    unchecked_repo.gh._rate_limiter.update('search', 0, 0)
+    unchecked_repo.gh.x_ratelimit_remaining = 10
+
+    with pytest.raises(SystemExit):
+        unchecked_repo.issues(
+            state='closed',
+            milestone=None,
+            since='2020-01-01T00:00:00Z',
+            until='2020-01-03T00:00:00Z')
+
+
+def test_filter_closed_prs_errors(unchecked_repo, capsys):
+    issues = [{'number': n, 'labels': [], 'pull_request': {'url': ''}}
+              for n in (2, 1)]
+
+    def request(method, url, **kwargs):
+        return make_response(500, {'message': 'Server Error'})
+
+    # Errors other than a 404 do not mean that a PR was not merged
+    with patch.object(unchecked_repo.gh, '_retries', 0), \
+            patch.object(unchecked_repo.gh._session, 'request', new=request):
+        with pytest.raises(ApiError):
+            unchecked_repo._filer_closed_prs(issues[:], branch=None)
+        with pytest.raises(ApiError):
+            unchecked_repo.is_merged(1)
+
+    # The rate limit is checked and reported once for all the PRs
+    unchecked_repo.gh.x_ratelimit_remaining = 0
+    unchecked_repo.gh.x_ratelimit_reset = 0
+    capsys.readouterr()
+    with pytest.raises(SystemExit):
+        unchecked_repo._filer_closed_prs(issues[:], branch=None)
+    assert capsys.readouterr().out.count('rate limit exceeded') == 1
+
+
+def test_rate_limit_exceeded_while_paging(unchecked_repo, capsys):
+    link = ('<https://api.github.com/repos/{0}/issues?page=4'
+            '&per_page=100>; rel="last"'.format(REPO))
+    reset = int(time.time()) + 60
+    urls = []
+
+    def request(method, url, **kwargs):
+        urls.append(url)
+        headers = {
+            'Link': link,
+            'X-RateLimit-Remaining': '0',
+            'X-RateLimit-Reset': str(reset),
+        }
+        return make_response(data=[], headers=headers)
+
+    # The budget runs out with the first page, so the concurrent requests
+    # of the other ones are refused by the client
+    with patch.object(unchecked_repo.gh._session, 'request', new=request):
+        with pytest.raises(SystemExit):
+            unchecked_repo.issues(state='closed')
+
+    assert len(urls) == 1
+    out = capsys.readouterr().out
+    assert out.count('LOGHUB: GitHub API rate limit exceeded!') == 1
+    assert 'resets on' in out
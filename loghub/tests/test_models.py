@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Tests issue records."""
+
+# Third party imports
+import pytest
+
+# Local imports
+from loghub.core.formatter import render_changelog, template_fields
+from loghub.core.models import (ClosedDateIndex, Issue, IssueProjector,
+                                 parse_date)
+
+
+# --- Fixtures
+# -----------------------------------------------------------------------------
+def payload(number, login='foo', labels=(), pr=False):
+    data = {
+        'number': number,
+        'title': 'title {0}'.format(number),
+        'html_url': 'https://github.com/foo/bar/issues/{0}'.format(number),
+        'state': 'closed',
+        'body': 'body',
+        'closed_at': '2020-01-01T00:00:00Z',
+        'user': {'login': login, 'html_url': 'https://github.com/' + login,
+                 'avatar_url': 'unused'},
+        'labels': [{'name': name, 'color': 'fff'} for name in labels],
+        'milestone': {'number': 1, 'title': 'v1.0', 'closed_at': None},
+        'reactions': {'total_count': 0},
+    }
+    if pr:
+        data['pull_request'] = {'html_url': data['html_url']}
+    return data
+
+
+# --- Tests
+# -----------------------------------------------------------------------------
+def test_projection():
+    projector = IssueProjector()
+    issue = projector(payload(1, labels=['bug']))
+
+    assert isinstance(issue, Issue)
+    assert projector(issue) is issue
+    assert issue.number == issue['number'] == issue.get('number') == 1
+    assert issue['user']['login'] == 'foo'
+    assert issue['milestone']['title'] == 'v1.0'
+    assert issue['loghub_label_names'] == ['bug']
+    assert not issue.get('pull_request')
+    assert issue.get('reactions', 'missing') == 'missing'
+    assert not hasattr(issue, '__dict__')
+
+    with pytest.raises(KeyError):
+        issue['reactions']
+
+    issue['loghub_related_pulls'] = [{'url': 'url'}]
+    assert issue.loghub_related_pulls == [{'url': 'url'}]
+
+
+def test_projection_shares_records():
+    projector = IssueProjector()
+    first, second = projector.project([
+        payload(1, labels=['bug']),
+        payload(2, labels=['bug'], pr=True),
+    ])
+
+    assert first.user is second.user
+    assert first.labels[0] is second.labels[0]
+    assert first.milestone is second.milestone
+    assert second.pull_request
+
+
+def test_render_records():
+    projector = IssueProjector()
+    issues = projector.project([payload(1)])
+    prs = projector.project([payload(2, pr=True)])
+    log = render_changelog('foo/bar', issues, prs, version='1.0',
+                           closed_at='2020-01-01T00:00:00Z')
+
+    assert '* [Issue 1](https://github.com/foo/bar/issues/1) - title 1' in log
+    assert ('* [PR 2](https://github.com/foo/bar/pull/2) - title 2, by '
+            '[@foo](https://github.com/foo)') in log
+
+
+def test_projection_fields(tmpdir):
+    projector = IssueProjector()
+    issue, pr = projector.project([payload(1), payload(2, pr=True)])
+
+    # Issue bodies are not used by the bundled templates
+    assert issue.body is None
+    assert pr.body == 'body'
+
+    template = tmpdir.join('template.txt')
+    template.write("{% for i in issues %}{{ i.body }} {{ i['reactions']"
+                   "['total_count'] }}{% endfor %}")
+    fields = template_fields(str(template))
+    assert {'body', 'reactions', 'total_count'} <= fields
+
+    projector = IssueProjector(fields=fields)
+    issue = projector(payload(1))
+    assert issue.body == 'body'
+    assert issue.reactions == issue['reactions'] == {'total_count': 0}
+    assert 'reactions' in issue and 'total_count' not in issue
+    with pytest.raises(AttributeError):
+        issue.total_count
+
+    log = render_changelog('foo/bar', [issue], [], version='1.0',
+                           template_file=str(template))
+    assert log == 'body 0'
+
+
+def test_projection_nested_fields(tmpdir):
+    data = payload(1, labels=['bug'])
+    data['user']['avatar_url'] = 'AV'
+    data['labels'][0]['color'] = 'red'
+    data['milestone']['due_on'] = 'DUE'
+
+    template = tmpdir.join('template.txt')
+    template.write("{% for i in issues %}{{ i.user.avatar_url }} "
+                   "{% for l in i.labels %}{{ l.color }}{% endfor %} "
+                   "{{ i.milestone.due_on }}{% endfor %}")
+    projector = IssueProjector(fields=template_fields(str(template)))
+    issue = projector(data)
+
+    # Shared records keep the nested fields used by the template
+    assert issue.user.avatar_url == 'AV'
+    assert 'color' in issue.labels[0]
+    log = render_changelog('foo/bar', [issue], [], version='1.0',
+                           template_file=str(template))
+    assert log == render_changelog('foo/bar', [data], [], version='1.0',
+                                   template_file=str(template))
+    assert log == 'AV red DUE'
+
+
+def test_parse_date():
+    date = parse_date('2016-10-10T08:08:08Z')
+    assert (date.year, date.month, date.day) == (2016, 10, 10)
+    assert (date.hour, date.minute, date.second) == (8, 8, 8)
+
+    # Non padded dates go through the slow path
+    assert parse_date('2016-1-2T3:04:05Z') == parse_date('2016-01-02T03:04:05Z')
+
+
+def test_closed_date_index():
+    projector = IssueProjector()
+    issues = []
+    for number, day in [(5, 3), (4, 1), (3, 5), (2, 2), (1, 4)]:
+        data = payload(number)
+        data['closed_at'] = '2020-01-{0:02d}T00:00:00Z'.format(day)
+        issues.append(projector(data))
+
+    assert issues[0].loghub_closed_date == parse_date(issues[0].closed_at)
+
+    index = ClosedDateIndex(issues)
+    window = index.window(since=parse_date('2020-01-02T00:00:00Z'),
+                          until=parse_date('2020-01-04T00:00:00Z'))
+    assert [issue.number for issue in window] == [5, 2, 1]
+    assert len(index.window()) == 5
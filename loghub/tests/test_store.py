@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) The Spyder Development Team
+#
+# Licensed under the terms of the MIT License
+# (See LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Tests local store."""
+
+# Standard library imports
+import os
+
+# Local imports
+from loghub.core.store import IssueStore
+
+
+# --- Tests
+# -----------------------------------------------------------------------------
+def test_store_issues(tmpdir):
+    path = os.path.join(str(tmpdir), 'store.sqlite')
+    store = IssueStore(path)
+    store.save_issues('foo/bar', [
+        {'number': 1, 'state': 'closed', 'updated_at': '2020-01-01T00:00:00Z',
+         'labels': [{'name': 'bug'}]},
+        {'number': 2, 'state': 'open', 'updated_at': '2020-02-01T00:00:00Z'},
+    ])
+    store.set_last_sync('foo/bar', 'issues', '2020-02-01T00:00:00Z')
+    store.close()
+
+    # Data persists across instances and is kept per repo
+    store = IssueStore(path)
+    assert store.last_sync('foo/bar', 'issues') == '2020-02-01T00:00:00Z'
+    assert store.last_sync('foo/baz', 'issues') is None
+    assert [i['number'] for i in store.load_issues('foo/bar')] == [2, 1]
+    assert store.load_issues('foo/baz') == []
+
+    closed = store.load_issues('foo/bar', state='closed')
+    assert [i['number'] for i in closed] == [1]
+    assert closed[0]['labels'][0]['name'] == 'bug'
+
+    since = store.load_issues('foo/bar', since='2020-01-15T00:00:00Z')
+    assert [i['number'] for i in since] == [2]
+
+    # Issues are updated in place
+    store.save_issues('foo/bar', [
+        {'number': 2, 'state': 'closed', 'updated_at': '2020-03-01T00:00:00Z'},
+    ])
+    closed = store.load_issues('foo/bar', state='closed')
+    assert [i['number'] for i in closed] == [2, 1]
+
+
+def test_store_pulls_tags_documents(tmpdir):
+    store = IssueStore(os.path.join(str(tmpdir), 'store.sqlite'))
+    store.save_pulls('foo/bar', [
+        {'number': 1, 'merged_at': None, 'base': {'ref': 'master'}},
+    ])
+    assert store.load_pulls('foo/bar') == {
+        1: {'merged_at': None, 'base_ref': 'master'},
+    }
+
+    store.save_tags('foo/bar', [('v0.1', 'abc', '2020-01-01T00:00:00Z')])
+    assert store.load_tags('foo/bar') == {
+        'v0.1': ('abc', '2020-01-01T00:00:00Z'),
+    }
+
+    assert store.load_document('foo/bar', 'milestones') is None
+    store.save_document('foo/bar', 'milestones', [{'title': 'v0.1'}])
+    assert store.load_document('foo/bar', 'milestones')[0]['title'] == 'v0.1'
@@ -7,6 +7,12 @@
 # -----------------------------------------------------------------------------
 """Tests utils."""
 
+# Standard library imports
+import json
+
+# Third party imports
+import requests
+
 
 class Issue:
     """Issue github mock."""
@@ -39,3 +45,16 @@ class Issue:
             return self.__dict__.get(name)
         else:
             return self.__dict__.get(name, default)
+
+
+def make_response(status_code=200, data=None, headers=None):
+    """Create a requests response mock for the Github client."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    if data is not None:
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        response._content = json.dumps(data).encode('utf-8')
+    else:
+        response._content = b''
+    return response
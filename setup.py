@@ -61,6 +61,7 @@ setup(
     packages=find_packages(exclude=['contrib', 'docs', 'tests*']),
     package_data={'loghub.templates': ['*.txt']},
     install_requires=REQUIREMENTS,
+    extras_require={'fast': ['orjson']},
     entry_points={
         'console_scripts': [
             'loghub = loghub.cli.main:main',